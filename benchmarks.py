@@ -0,0 +1,230 @@
+"""
+Scaling benchmarks for the city simulator.
+
+Sweeps city size, block size, per-density HS/BS counts, NUM_DAYS and D_w/D_c.
+Every configuration runs a one-year simulation twice: a plain pass for the wall
+time of each phase and a tracemalloc pass (skip it with --no-memory) for its
+peak traced memory, since tracing slows every allocation down. A tiny warm-up
+run first pays for the lazy scipy / matplotlib imports. Each configuration runs
+in a fresh process, so its max_rss_mb (and max_child_rss_mb) cover that
+configuration's plain pass only. The phases are:
+
+    placement, assign_group, find_groups_and_sum_frequencies, demand,
+    allocation (make_request + queue drain + allocate_spectrum),
+    generate_report, and plotting.<figure> for every figure in render.FIGURES
+
+Figures are drawn in-process, one at a time (Simulation.plot_results would
+spread them over a process pool whose time and memory this process can't
+attribute); the peak RSS of any child processes is reported separately.
+
+Results are appended as one JSON object per configuration to --out, tagged
+with the git commit, so runs from different commits can be compared.
+
+Example:
+    python benchmarks.py --city-sizes 10 30 100 --unit-counts 3,5,7/1,2,5 --days 1 --out bench.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import resource
+import multiprocessing
+import itertools
+import contextlib
+import subprocess
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import networks
+import profiling
+import render
+
+PHASES = [
+    "placement",
+    "assign_group",
+    "find_groups_and_sum_frequencies",
+    "demand",
+    "allocation",
+    "generate_report",
+] + [f"plotting.{name}" for name in render.FIGURES]
+
+
+def phase_results(timer, memory_timer=None):
+    """
+    {phase: {seconds, calls, peak_mb}} for the benchmarked phases: wall times
+    from timer, peak memory from memory_timer (None if there was no memory pass).
+    """
+    return {
+        name: {
+            "seconds": timer.seconds[name],
+            "calls": timer.calls[name],
+            "peak_mb": memory_timer.peak_bytes[name] / 2**20 if memory_timer is not None else None,
+        }
+        for name in PHASES if name in timer.calls
+    }
+
+
+@contextlib.contextmanager
+def instrumented(timer):
+    """Temporarily routes every benchmarked phase of networks.py through timer."""
+    targets = [
+        (networks, "place_units", "placement"),
+        (networks, "assign_group", "assign_group"),
+        (networks, "find_groups_and_sum_frequencies", "find_groups_and_sum_frequencies"),
+        (networks.DemandGenerator, "draw", "demand"),
+        (networks.Simulation, "make_requests", "allocation"),
+        (networks, "drain_requests", "allocation"),
+        (networks, "allocate_spectrum", "allocation"),
+        (networks.Simulation, "generate_report", "generate_report"),
+    ]
+    originals = [(owner, attr, getattr(owner, attr)) for owner, attr, _ in targets]
+    try:
+        for owner, attr, name in targets:
+            setattr(owner, attr, timer.wrap(name, getattr(owner, attr)))
+        yield
+    finally:
+        for owner, attr, fn in originals:
+            setattr(owner, attr, fn)
+
+
+def parse_unit_counts(text):
+    """'3,5,7/1,2,5' -> ({0: 3, 1: 5, 2: 7}, {0: 1, 1: 2, 2: 5})"""
+    hs, bs = text.split("/")
+    return (dict(enumerate(int(n) for n in hs.split(","))),
+            dict(enumerate(int(n) for n in bs.split(","))))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_pass(settings, run_dir, plots=True, track_memory=False):
+    """
+    Runs one configuration once with every phase timed and returns (sim, timer,
+    total seconds). With track_memory the run is traced by tracemalloc, whose
+    allocation hooks inflate the timings, so only its peak memory is used.
+    """
+    timer = profiling.PhaseTimer(enabled=True, track_memory=track_memory)
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with instrumented(timer), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            sim = networks.Simulation(
+                config,
+                NUM_YEARS=1,
+                VERBOSITY=0,
+                OUTPUT_DIR=os.path.join(run_dir, "outputs"),
+                REPORT_FILE=os.path.join(run_dir, "report.log"),
+                **settings,
+            )
+            sim.simulate_dynamic_allocation()
+            if plots:
+                for name in render.FIGURES:
+                    with timer.phase(f"plotting.{name}"):
+                        render.render_figure(name, sim.output_dir, sim.output_dir)
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return sim, timer, time.perf_counter() - start
+
+
+def warm_up(out_dir, plots=True):
+    """
+    Runs a tiny city once so the lazy imports (scipy, matplotlib) and other
+    first-call costs aren't charged to the first benchmarked configuration.
+    """
+    run_pass({"CITY_SIZE": (2, 2), "NUM_DAYS": 1}, os.path.join(out_dir, "warm_up"), plots)
+
+
+def run_benchmark(settings, out_dir, plots=True, memory=True):
+    """
+    Runs one configuration and returns its result record: wall times from a
+    plain pass, then peak memory from a second, traced pass (unless memory is False).
+    max_rss_mb is this process's high-water mark after the plain pass, so call
+    it through run_isolated to get the figure of this configuration alone.
+    """
+    hs_counts = ",".join(str(n) for n in settings["N_HS_PER_DENSITY"].values())
+    bs_counts = ",".join(str(n) for n in settings["N_BS_PER_DENSITY"].values())
+    run_dir = os.path.join(out_dir, f"city{settings['CITY_SIZE'][0]}x{settings['CITY_SIZE'][1]}"
+                                    f"_block{settings['BLOCK_SIZE']}_units{hs_counts}-{bs_counts}"
+                                    f"_days{settings['NUM_DAYS']}_Dw{settings['D_w']}_Dc{settings['D_c']}")
+
+    sim, timer, total_seconds = run_pass(settings, run_dir, plots)
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    max_child_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    memory_timer = run_pass(settings, run_dir, plots, track_memory=True)[1] if memory else None
+
+    return {
+        "git_commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "settings": {key: (list(value) if isinstance(value, tuple) else value) for key, value in settings.items()},
+        "num_hs": sim.total_num_hs,
+        "num_bs": sim.total_num_bs,
+        "total_seconds": total_seconds,
+        "max_rss_mb": max_rss_mb,
+        "max_child_rss_mb": max_child_rss_mb,
+        "phases": phase_results(timer, memory_timer),
+    }
+
+
+def run_isolated(settings, out_dir, plots=True, memory=True):
+    """
+    Warms up and runs one configuration in a fresh (spawned) process, since
+    ru_maxrss only ever grows over a process's lifetime.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pool.submit(warm_up, out_dir, plots).result()
+        return pool.submit(run_benchmark, settings, out_dir, plots, memory).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark how the city simulator scales.")
+    parser.add_argument("--city-sizes", nargs="+", type=int, default=[10], help="blocks per side")
+    parser.add_argument("--block-sizes", nargs="+", type=int, default=[10])
+    parser.add_argument("--unit-counts", nargs="+", default=["3,5,7/1,2,5"],
+                        help="HS counts for density 0,1,2 / BS counts for density 0,1,2")
+    parser.add_argument("--days", nargs="+", type=int, default=[config.NUM_DAYS])
+    parser.add_argument("--D_w", nargs="+", type=float, default=[config.D_w])
+    parser.add_argument("--D_c", nargs="+", type=float, default=[config.D_c])
+    parser.add_argument("--no-plots", action="store_true", help="skip the plotting phases")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced pass that measures peak memory")
+    parser.add_argument("--work-dir", default="bench_runs", help="where per-run outputs are written")
+    parser.add_argument("--out", default="bench_results.jsonl", help="JSON lines file results are appended to")
+    args = parser.parse_args()
+
+    for city_size, block_size, unit_counts, days, D_w, D_c in itertools.product(
+            args.city_sizes, args.block_sizes, args.unit_counts, args.days, args.D_w, args.D_c):
+        hs_per_density, bs_per_density = parse_unit_counts(unit_counts)
+        settings = {
+            "CITY_SIZE": (city_size, city_size),
+            "BLOCK_SIZE": block_size,
+            "N_HS_PER_DENSITY": hs_per_density,
+            "N_BS_PER_DENSITY": bs_per_density,
+            "NUM_DAYS": days,
+            "D_w": D_w,
+            "D_c": D_c,
+        }
+        result = run_isolated(settings, args.work_dir, plots=not args.no_plots, memory=not args.no_memory)
+        result["settings"]["N_HS_PER_DENSITY"] = list(hs_per_density.values())
+        result["settings"]["N_BS_PER_DENSITY"] = list(bs_per_density.values())
+
+        with open(args.out, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+        phases = ", ".join(f"{name} {phase['seconds']:.3f}s"
+                           + (f"/{phase['peak_mb']:.1f}MB" if phase["peak_mb"] is not None else "")
+                           for name, phase in result["phases"].items())
+        print(f"city {city_size}x{city_size} block {block_size} units {unit_counts} days {days} "
+              f"D_w {D_w} D_c {D_c}: {result['total_seconds']:.2f}s ({phases})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Heap-based discrete-event scheduler.
+
+Events are (time, priority, seq, kind, payload) entries on a binary heap and are
+handed to handlers[kind](time, payload) in time order; at equal times lower
+priority runs first, then insertion order. Large numbers of timed items (e.g.
+request arrivals) are scheduled as one event per time bin carrying array
+columns, so the heap only ever holds a handful of entries per tick.
+
+    scheduler = EventScheduler()
+    scheduler.schedule(1.0, "tick", priority=1)
+    scheduler.schedule_batch(arrival_times, "arrival", (unit_ids, bandwidths), bin_edges=ticks)
+    scheduler.run_until(4.0, {"tick": on_tick, "arrival": on_arrival})
+"""
+import heapq
+import itertools
+
+import numpy as np
+
+
+class EventScheduler:
+    def __init__(self):
+        self.now = 0.0
+        self.processed = 0 # number of events handled so far
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, time, kind, payload=None, priority=0):
+        heapq.heappush(self._heap, (time, priority, next(self._seq), kind, payload))
+
+    def schedule_batch(self, times, kind, columns, bin_edges, priority=0):
+        """
+        Schedules timed items in bulk. Item i falls in the first bin whose edge is
+        >= times[i]; every non-empty bin becomes one event at its edge whose
+        payload is (times, *columns) restricted to the items of that bin.
+        Items later than the last edge are dropped; returns how many were scheduled.
+        """
+        times = np.asarray(times)
+        bins = np.searchsorted(bin_edges, times, side="left")
+        order = np.argsort(bins, kind="stable")
+        bins = bins[order]
+        bounds = np.flatnonzero(np.diff(bins)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(bins)]))
+
+        scheduled = 0
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            if start == stop or bins[start] >= len(bin_edges):
+                continue
+            items = order[start:stop]
+            payload = (times[items],) + tuple(column[items] for column in columns)
+            self.schedule(float(bin_edges[bins[start]]), kind, payload, priority)
+            scheduled += stop - start
+        return scheduled
+
+    def run_until(self, end_time, handlers):
+        """Handles every event scheduled at or before end_time, in order."""
+        heap = self._heap
+        while heap and heap[0][0] <= end_time:
+            time, _, _, kind, payload = heapq.heappop(heap)
+            self.now = time
+            handlers[kind](time, payload)
+            self.processed += 1
+        self.now = max(self.now, end_time)
+
+    def clear(self):
+        """Drops every pending event; returns how many there were."""
+        dropped = len(self._heap)
+        self._heap.clear()
+        return dropped
@@ -1,122 +1,228 @@
+import io
 import os
 import math
-import copy
-import queue
-import random
+import json
 import numpy as np
 from enum import Enum
-from collections import deque
-from scipy.spatial import KDTree
-import matplotlib.pyplot as plt
+from types import SimpleNamespace
 from collections import defaultdict
-from scipy.spatial.distance import cdist
-from matplotlib.colors import ListedColormap
-
-from collections import Counter
-
-import seaborn as sns
-import numpy as np
-import matplotlib.animation as animation
+from collections.abc import Mapping
 
 import config
+import events
+import records
+import profiling
 
 U6_START = 6.5
 U6_END = 7.2
 
-demand_growth_rate = 1.0
-report_file_path = "report.log"
-
-total_num_hs = 0
-total_num_bs = 0
-
-# Constants
-NUM_YEARS = config.NUM_YEARS
-NUM_DAYS = config.NUM_DAYS
-D_w = config.D_w 
-D_c = config.D_c
-traffic_demand_bounds = config.traffic_demand_bounds
-
-db_snapshots = []
-yearly_stats = defaultdict(list)
-yearly_congestion_hs = {0: [], 1: [], 2: []}
-yearly_congestion_bs = {0: [], 1: [], 2: []}
-daily_snapshot_stats = defaultdict(lambda: [[] for _ in range(6)])
-density_congestion_stats = defaultdict(lambda: defaultdict(list))
-
 
 class UnitType(Enum):
     BS = 0
     HS = 1
 
+class UnitStore:
+    """
+    Columnar (structure-of-arrays) storage for every unit in the city.
+    Row i of each column holds the state of the unit with id i, so whole-city
+    updates can be done with NumPy array ops instead of per-object loops.
+    """
+    # column name -> (trailing shape, dtype, fill value)
+    COLUMNS = {
+        "position": ((2,), np.int32, 0),
+        "unit_type": ((), np.int8, 0),
+        "density": ((), np.int8, 0),
+        "traffic_demand": ((), np.int64, 0),
+        "bandwidth": ((), np.float64, 0.0),
+        "congested": ((), np.bool_, False),
+        "group_id": ((), np.int64, -1),
+        "limit": ((), np.float64, np.nan),
+    }
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.version = 0 # bumped whenever units are added or moved
+        self._columns = {
+            name: np.full((capacity,) + shape, fill, dtype=dtype)
+            for name, (shape, dtype, fill) in self.COLUMNS.items()
+        }
+        self.frequency_bands = defaultdict(set) # unit id -> set of (start_freq, end_freq), sparse
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, capacity):
+        old_capacity = len(self._columns["unit_type"])
+        if capacity <= old_capacity:
+            return
+        capacity = max(capacity, 2 * old_capacity)
+        for name, (shape, dtype, fill) in self.COLUMNS.items():
+            column = np.full((capacity,) + shape, fill, dtype=dtype)
+            column[:self.size] = self._columns[name][:self.size]
+            self._columns[name] = column
+
+    def add_units(self, positions, unit_types, densities, traffic_demand=0):
+        """Appends a batch of units and returns the range of their ids."""
+        positions = np.asarray(positions, dtype=np.int32).reshape(-1, 2)
+        count = len(positions)
+        start = self.size
+        self._reserve(start + count)
+        stop = start + count
+
+        self._columns["position"][start:stop] = positions
+        self._columns["unit_type"][start:stop] = unit_types
+        self._columns["density"][start:stop] = densities
+        self._columns["traffic_demand"][start:stop] = traffic_demand
+        self.size = stop
+        self.version += 1
+        return range(start, stop)
+
+    def move_units(self, unit_ids, positions):
+        """Moves units; the position column is read-only elsewhere so every move bumps version."""
+        self._columns["position"][unit_ids] = positions
+        self.version += 1
+
+    def add_unit(self, position, traffic_demand, unit_type, density):
+        return self.add_units([position], unit_type.value, density, traffic_demand)[0]
+
+    def copy(self):
+        """Returns an independent copy of the store, trimmed to its size."""
+        store = UnitStore(capacity=max(self.size, 1))
+        for name in self.COLUMNS:
+            store._columns[name][:self.size] = self._columns[name][:self.size]
+        store.size = self.size
+        store.version = self.version
+        store.frequency_bands = defaultdict(set, {uid: set(bands) for uid, bands in self.frequency_bands.items()})
+        return store
+
+    def columns(self):
+        """Returns every column, trimmed to the store's size."""
+        return {name: self._columns[name][:self.size] for name in self.COLUMNS}
+
+    def load_columns(self, columns):
+        """Replaces the store's contents with the given columns (as returned by columns())."""
+        size = len(columns["unit_type"])
+        self._reserve(size)
+        for name, (shape, dtype, fill) in self.COLUMNS.items():
+            self._columns[name][:size] = columns[name]
+            self._columns[name][size:] = fill
+        self.size = size
+        self.version += 1
+
+    def mask(self, unit_type):
+        return self.unit_type == unit_type.value
+
+    def count(self, unit_type):
+        return int(np.count_nonzero(self.mask(unit_type)))
+
+
+def _unit_column(name):
+    def get(self):
+        column = self._columns[name][:self.size]
+        if name == "position":
+            # in-place writes would skip the version bump that invalidates GroupingCache
+            column.flags.writeable = False
+        return column
+
+    def set(self, value):
+        self._columns[name][:self.size] = value
+        if name == "position":
+            self.version += 1
+
+    return property(get, set)
+
+for _name in UnitStore.COLUMNS:
+    setattr(UnitStore, _name, _unit_column(_name))
+
+
 class NetworkUnit:
-    def __init__(self, id, position, traffic_demand, unit_type, density, limit=None):
+    """
+    Thin view of one row of a UnitStore. Reads and writes go straight through
+    to the store's columns, so existing per-unit code keeps working.
+    """
+    __slots__ = ("_store", "id")
+
+    def __init__(self, store, id):
+        self._store = store
         self.id = id
-        self.position = position
-        self.traffic_demand = traffic_demand # units = MHz
-        self.frequency_bands = set() # list of tuples (start_freq, end_freq)
-        self.congested = False
-        self.unit_type = unit_type
-        self.group_id = None
-        self.density = density
-        self.limit = limit
-        self.bandwidth = 0
-
-    """
-    STEP 4: Updating traffic demand according to population density and time of day
-    TODO: [Nicole] - acc to # of ppl, remove commuting hours 
-                                          low         medium       high
-    density = 0: [20, 50] Mbps       --> [20,30],     [30,40],     [40,50]
-    density = 1: [200, 500] Mbps     --> [200,300],   [300,400],   [400,500]
-    density = 2: [2000, 5000] Mbps   --> [2000,3000], [3000,4000], [4000,5000]
-
-    0:00 -  8:00 : low usage       (wifi:cell = 50:50)
-    8:00 - 12:00 : high wifi usage (wifi:cell = 70:30)
-    12:00 - 15:00 : high cell usage (wifi:cell = 30:70)
-    15:00 - 17:00 : high wifi usage (wifi:cell = 80:20)
-    17:00 - 19:00 : high cell usage (wifi:cell = 40:60)
-    19:00 - 24:00 : high wifi usage (wifi:cell = 75:25)
-    """
-    def calculate_traffic_demand(self, snapshot, demand_growth_rate, traffic_demand_bounds):
-        
-        # pop density --> (lower, upper) traffic demand bound for the unit
-
-        # (snapshot, unit_type) --> traffic intensity level
-        traffic_intensity = {
-            (0, UnitType.HS): "low",
-            (0, UnitType.BS): "low",
-            (1, UnitType.HS): "medium",
-            (1, UnitType.BS): "low",
-            (2, UnitType.HS): "medium",
-            (2, UnitType.BS): "high",
-            (3, UnitType.HS): "high",
-            (3, UnitType.BS): "medium",
-            (4, UnitType.HS): "medium",
-            (4, UnitType.BS): "high",
-            (5, UnitType.HS): "high",
-            (5, UnitType.BS): "low",
-        }
 
-        lower_bound, upper_bound = traffic_demand_bounds[int(self.density)]
-        lower_bound = int(lower_bound * demand_growth_rate)
-        upper_bound = int(upper_bound * demand_growth_rate)
-        traffic_intensity = traffic_intensity[(snapshot, self.unit_type)]
+    @property
+    def position(self):
+        x, y = self._store.position[self.id].tolist()
+        return (x, y)
+
+    @position.setter
+    def position(self, value):
+        self._store.move_units(self.id, value)
+
+    @property
+    def traffic_demand(self):
+        return int(self._store.traffic_demand[self.id]) # units = MHz
+
+    @traffic_demand.setter
+    def traffic_demand(self, value):
+        self._store.traffic_demand[self.id] = value
+
+    @property
+    def unit_type(self):
+        return UnitType(int(self._store.unit_type[self.id]))
+
+    @property
+    def density(self):
+        return int(self._store.density[self.id])
+
+    @property
+    def bandwidth(self):
+        return float(self._store.bandwidth[self.id])
+
+    @bandwidth.setter
+    def bandwidth(self, value):
+        self._store.bandwidth[self.id] = value
+
+    @property
+    def congested(self):
+        return bool(self._store.congested[self.id])
+
+    @congested.setter
+    def congested(self, value):
+        self._store.congested[self.id] = value
+
+    @property
+    def group_id(self):
+        group_id = int(self._store.group_id[self.id])
+        return None if group_id < 0 else group_id
 
-        range_size = upper_bound - lower_bound
-        third = range_size // 3
+    @group_id.setter
+    def group_id(self, value):
+        self._store.group_id[self.id] = -1 if value is None else value
 
-        match traffic_intensity:
-            case "low":
-                upper_bound = lower_bound + third
-            case "medium":
-                lower_bound += third
-                upper_bound = lower_bound + third
-            case "high":
-                lower_bound = upper_bound - third
+    @property
+    def limit(self):
+        limit = float(self._store.limit[self.id])
+        return None if math.isnan(limit) else limit
 
-        return random.randint(lower_bound, upper_bound) #uniform distribution
+    @limit.setter
+    def limit(self, value):
+        self._store.limit[self.id] = np.nan if value is None else value
 
-    def update_traffic_demand(self, snapshot, demand_growth_rate, traffic_demand_bounds):
-        self.traffic_demand = self.calculate_traffic_demand(snapshot, demand_growth_rate, traffic_demand_bounds)
+    @property
+    def frequency_bands(self):
+        return self._store.frequency_bands[self.id] # set of tuples (start_freq, end_freq)
+
+    def __eq__(self, other):
+        return isinstance(other, NetworkUnit) and self._store is other._store and self.id == other.id
+
+    def __hash__(self):
+        return hash((id(self._store), self.id))
+
+    def calculate_traffic_demand(self, snapshot, demand_growth_rate, traffic_demand_bounds, rng):
+        """rng is a numpy Generator, e.g. the "demand" stream of make_streams."""
+        table = demand_bounds_table(demand_growth_rate, traffic_demand_bounds)
+        lower_bound, upper_bound = table[snapshot, self.unit_type.value, self.density].tolist()
+        return int(rng.integers(lower_bound, upper_bound, endpoint=True)) #uniform distribution
+
+    def update_traffic_demand(self, snapshot, demand_growth_rate, traffic_demand_bounds, rng):
+        self.traffic_demand = self.calculate_traffic_demand(snapshot, demand_growth_rate, traffic_demand_bounds, rng)
 
 
     """
@@ -148,6 +254,74 @@ class NetworkUnit:
 
 
 
+"""
+STEP 4: Updating traffic demand according to population density and time of day
+TODO: [Nicole] - acc to # of ppl, remove commuting hours 
+                                      low         medium       high
+density = 0: [20, 50] Mbps       --> [20,30],     [30,40],     [40,50]
+density = 1: [200, 500] Mbps     --> [200,300],   [300,400],   [400,500]
+density = 2: [2000, 5000] Mbps   --> [2000,3000], [3000,4000], [4000,5000]
+
+0:00 -  8:00 : low usage       (wifi:cell = 50:50)
+8:00 - 12:00 : high wifi usage (wifi:cell = 70:30)
+12:00 - 15:00 : high cell usage (wifi:cell = 30:70)
+15:00 - 17:00 : high wifi usage (wifi:cell = 80:20)
+17:00 - 19:00 : high cell usage (wifi:cell = 40:60)
+19:00 - 24:00 : high wifi usage (wifi:cell = 75:25)
+"""
+# (snapshot, unit_type) --> traffic intensity level: 0 = low, 1 = medium, 2 = high
+#                              BS  HS
+TRAFFIC_INTENSITY = np.array([[0, 0],
+                              [0, 1],
+                              [2, 1],
+                              [1, 2],
+                              [2, 1],
+                              [0, 2]], dtype=np.int8)
+
+def demand_bounds_table(demand_growth_rate, traffic_demand_bounds):
+    """
+    Returns an int array of shape (snapshot, unit_type, density, 2) holding the
+    inclusive (lower, upper) traffic demand bound for every combination.
+    """
+    # pop density --> (lower, upper) traffic demand bound for the unit
+    density_bounds = np.array([traffic_demand_bounds[d] for d in range(len(traffic_demand_bounds))], dtype=np.float64)
+    lower_bound = (density_bounds[:, 0] * demand_growth_rate).astype(np.int64)
+    upper_bound = (density_bounds[:, 1] * demand_growth_rate).astype(np.int64)
+    third = (upper_bound - lower_bound) // 3
+
+    # intensity level --> (lower, upper) per density
+    level_bounds = np.stack([
+        np.stack([lower_bound, lower_bound + third], axis=-1),               # low
+        np.stack([lower_bound + third, lower_bound + 2 * third], axis=-1),   # medium
+        np.stack([upper_bound - third, upper_bound], axis=-1),               # high
+    ])
+    return level_bounds[TRAFFIC_INTENSITY]
+
+
+class DemandGenerator:
+    """
+    Draws the traffic demand of every unit for a snapshot in one batch.
+    The bounds table is rebuilt only when the demand growth rate changes.
+    rng defaults to the "demand" stream of config.SEED / config.REPLICA.
+    """
+    def __init__(self, traffic_demand_bounds, rng=None):
+        self.traffic_demand_bounds = traffic_demand_bounds
+        self.rng = rng if rng is not None else default_stream("demand")
+        self._demand_growth_rate = None
+        self._table = None
+
+    def bounds_table(self, demand_growth_rate):
+        if demand_growth_rate != self._demand_growth_rate:
+            self._table = demand_bounds_table(demand_growth_rate, self.traffic_demand_bounds)
+            self._demand_growth_rate = demand_growth_rate
+        return self._table
+
+    def draw(self, snapshot, unit_type, density, demand_growth_rate):
+        """Returns one uniform demand draw per unit, given the unit_type and density columns."""
+        bounds = self.bounds_table(demand_growth_rate)[snapshot, unit_type, density]
+        return self.rng.integers(bounds[:, 0], bounds[:, 1], endpoint=True) #uniform distribution
+
+
 def total_frequency_allocated(unit):
     total = 0.0
     for band in unit.frequency_bands:
@@ -162,29 +336,34 @@ def calculate_distance(unit1, unit2):
     x2, y2 = unit2.position
     return np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
 
-# Make sure output directory exists
-os.makedirs("outputs", exist_ok=True)
+def plot_units(unit_type_to_plot, filename, units, D_threshold, output_dir="outputs",
+               max_points=100_000, max_edges=100_000, rng=None):
+    """
+    Scatter of the units of one type with a red line between every pair within
+    D_threshold. Pairs come from a KD-tree and are drawn as one LineCollection.
+    Above max_points units / max_edges pairs (None = no limit) a random subset
+    of that size is drawn; rng defaults to a fixed seed so a city always gives
+    the same picture.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    from scipy.spatial import cKDTree
 
-def plot_units(unit_type_to_plot, filename, db, D_threshold):
-    units = [unit for unit in db.database.values() if unit.unit_type == unit_type_to_plot]
-    x_positions = [unit.position[0] for unit in units]
-    y_positions = [unit.position[1] for unit in units]
+    rng = rng if rng is not None else np.random.default_rng(0)
+    positions = units.position[units.mask(unit_type_to_plot)]
+    pairs = cKDTree(positions).query_pairs(D_threshold, output_type="ndarray") if len(positions) else np.empty((0, 2), dtype=np.intp)
+
+    points = positions
+    if max_points is not None and len(points) > max_points:
+        points = points[np.sort(rng.choice(len(points), max_points, replace=False))]
+    if max_edges is not None and len(pairs) > max_edges:
+        pairs = pairs[np.sort(rng.choice(len(pairs), max_edges, replace=False))]
 
     plt.figure(figsize=(10, 10))
-    plt.scatter(x_positions, y_positions, color='blue', label=f"{unit_type_to_plot.name} Unit")
-
-    for i, unit1 in enumerate(units):
-        for j, unit2 in enumerate(units):
-            if i < j:
-                distance = calculate_distance(unit1, unit2)
-                if distance <= D_threshold:
-                    plt.plot(
-                        [unit1.position[0], unit2.position[0]],
-                        [unit1.position[1], unit2.position[1]],
-                        color='red',
-                        alpha=0.6,
-                        label="Units within threshold" if i == 0 and j == 1 else ""
-                    )
+    plt.scatter(points[:, 0], points[:, 1], color='blue', label=f"{unit_type_to_plot.name} Unit")
+    if len(pairs):
+        plt.gca().add_collection(LineCollection(positions[pairs], colors='red', alpha=0.6,
+                                                label="Units within threshold"))
 
     plt.title(f"{unit_type_to_plot.name} Units within {D_threshold} Distance")
     plt.xlabel("X Position")
@@ -193,30 +372,193 @@ def plot_units(unit_type_to_plot, filename, db, D_threshold):
     plt.grid(True)
 
     # Save the figure
-    plt.savefig(f"outputs/{filename}.png")
+    os.makedirs(output_dir, exist_ok=True)
+    plt.savefig(f"{output_dir}/{filename}.png")
     plt.close()
 #-----------------------------------------------------------------------------------#
 
-"""
-STEP 1: Create dat "map"!
+def group_units(positions, distance_threshold):
+    """
+    Greedily covers the units with balls of radius distance_threshold and
+    returns each ball's members as an array of row indices into positions.
+    """
+    from scipy.spatial import KDTree
 
-TODO: [Swati] - change population_density acc to time of day 
-Assign areas: Business, Residential, Shopping(Lunch)
-"""
+    if len(positions) == 0:
+        return []
+    
+    tree = KDTree(positions)
 
-city_size = (10, 10)
-np.random.seed(42) #to keep the initialization the same
+    visited = np.zeros(len(positions), dtype=bool)
+    groups = []
 
-#simulating a pop density: 0 = Low, 1 = Medium, 2 = High
-population_density = np.random.choice([0, 1, 2], size=city_size, p=[0.3, 0.4, 0.3])
+    for idx in range(len(positions)):
+        if visited[idx]:
+            continue
+        # Find all neighbors within distance_threshold
+        indices = np.asarray(tree.query_ball_point(positions[idx], distance_threshold))
+        group = indices[~visited[indices]]
+        visited[indices] = True
+        groups.append(group)
+
+    return groups
+
+
+class GroupingCache:
+    """
+    Memoizes group_units per (unit type, distance threshold). Unit positions
+    only change when units are added or moved, which bumps UnitStore.version
+    and invalidates every cached entry (the position column is read-only, so
+    moves have to go through UnitStore.move_units).
+    """
+    def __init__(self, units):
+        self.units = units
+        self._cache = {}
+
+    def groups(self, unit_type, distance_threshold):
+        key = (unit_type, distance_threshold)
+        entry = self._cache.get(key)
+        if entry is None or entry[0] != self.units.version:
+            unit_ids = np.flatnonzero(self.units.mask(unit_type))
+            groups = [unit_ids[group] for group in group_units(self.units.position[unit_ids], distance_threshold)]
+            sizes = np.array([len(group) for group in groups], dtype=np.int64)
+            entry = (self.units.version, groups, sizes)
+            self._cache[key] = entry
+        return entry[1]
+
+    def group_sizes(self, unit_type, distance_threshold):
+        self.groups(unit_type, distance_threshold)
+        return self._cache[(unit_type, distance_threshold)][2]
+
+
+class UnitStoreView(Mapping):
+    """
+    Read-only mapping of unit id -> NetworkUnit view over a UnitStore, so code
+    written against the old `Database.database` dict keeps working.
+    """
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, unit_id):
+        if not 0 <= unit_id < self.store.size:
+            raise KeyError(unit_id)
+        return NetworkUnit(self.store, unit_id)
+
+    def __iter__(self):
+        return iter(range(self.store.size))
+
+    def __len__(self):
+        return self.store.size
+
+
+class RequestBuffer:
+    """
+    Batched request queue for the (single-threaded) simulation.
+
+    Requests are kept in preallocated (unit_id, requested_bw) arrays with one
+    entry per unit: a unit that requests again before the next drain has its
+    bandwidth added to its existing entry. drain() hands every entry to the
+    allocator at once, ordered by each unit's first request. Not thread-safe.
+    """
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._bandwidths = np.empty(capacity, dtype=np.float64)
+        self._slot = np.full(capacity, -1, dtype=np.int64) # unit id -> entry, -1 if none
+        self.reset_stats()
+
+    def __len__(self):
+        return self.size
+
+    def empty(self):
+        return self.size == 0
+
+    def _reserve(self, entries, max_unit_id):
+        if entries > len(self._ids):
+            capacity = max(entries, 2 * len(self._ids))
+            self._ids = np.resize(self._ids, capacity)
+            self._bandwidths = np.resize(self._bandwidths, capacity)
+        if max_unit_id >= len(self._slot):
+            slot = np.full(max(max_unit_id + 1, 2 * len(self._slot)), -1, dtype=np.int64)
+            slot[:len(self._slot)] = self._slot
+            self._slot = slot
+
+    def put(self, request):
+        """Queues one (unit_id, bandwidth) request, like queue.Queue.put."""
+        unit_id, bandwidth = request
+        self._reserve(self.size + 1, unit_id)
+        self.received += 1
+        slot = self._slot[unit_id]
+        if slot >= 0:
+            self._bandwidths[slot] += bandwidth
+            self.coalesced += 1
+            return
+        self._ids[self.size] = unit_id
+        self._bandwidths[self.size] = bandwidth
+        self._slot[unit_id] = self.size
+        self.size += 1
+        self.max_depth = max(self.max_depth, self.size)
+
+    def put_many(self, unit_ids, bandwidths):
+        """Queues a batch of requests, merging repeated unit ids."""
+        unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        bandwidths = np.asarray(bandwidths, dtype=np.float64)
+        if len(unit_ids) == 0:
+            return
+        self.received += len(unit_ids)
+
+        # merge repeats within the batch, keeping first-request order
+        unique_ids, first, inverse = np.unique(unit_ids, return_index=True, return_inverse=True)
+        totals = np.bincount(inverse, weights=bandwidths)
+        self._reserve(self.size + len(unique_ids), int(unique_ids[-1]))
+        order = np.argsort(first)
+        unique_ids, totals = unique_ids[order], totals[order]
+
+        slots = self._slot[unique_ids]
+        queued = slots >= 0
+        self._bandwidths[slots[queued]] += totals[queued]
+
+        new_ids = unique_ids[~queued]
+        stop = self.size + len(new_ids)
+        self._ids[self.size:stop] = new_ids
+        self._bandwidths[self.size:stop] = totals[~queued]
+        self._slot[new_ids] = np.arange(self.size, stop)
+        self.size = stop
+
+        self.coalesced += len(unit_ids) - len(new_ids)
+        self.max_depth = max(self.max_depth, self.size)
+
+    def drain(self):
+        """Empties the buffer into (unit_ids, bandwidths) arrays."""
+        unit_ids = self._ids[:self.size].copy()
+        bandwidths = self._bandwidths[:self.size].copy()
+        self._slot[unit_ids] = -1
+        self.size = 0
+        return unit_ids, bandwidths
+
+    def stats(self):
+        return {
+            "requests_received": self.received,
+            "requests_coalesced": self.coalesced,
+            "max_queue_depth": self.max_depth,
+        }
+
+    def reset_stats(self):
+        self.received = 0
+        self.coalesced = 0
+        self.max_depth = self.size
 
 
 class Database:
-    def __init__(self):
-        self.database = {}
+    def __init__(self, mode="Dynamic", spectrum_split=50):
+        self.mode = mode
+        self.spectrum_split = spectrum_split
+        self.units = UnitStore()
+        self.database = UnitStoreView(self.units)
+        self.grouping_cache = GroupingCache(self.units)
         self.wifi_freq_range = (U6_START, ((U6_END-U6_START)*0.50 + U6_START))
         self.cellular_freq_range = (((U6_END-U6_START)*0.50 + U6_START), U6_END)
-        self.request_queue = queue.Queue() 
+        self.request_queue = RequestBuffer()
 
     def update_ratios(self, snapshot):
         """
@@ -227,7 +569,7 @@ class Database:
         17:00 - 19:00 : high cell usage (wifi:cell = 40:60)
         19:00 - 24:00 : high wifi usage (wifi:cell = 75:25)
         """
-        if config.MODE == "Dynamic":
+        if self.mode == "Dynamic":
             if (snapshot == 0):
                 wifi_ratio = 50
             elif (snapshot == 1):
@@ -245,150 +587,203 @@ class Database:
             self.wifi_freq_range = (U6_START, wifi_end)
             self.cellular_freq_range = (wifi_end, U6_END)
 
-        elif config.MODE == "Cellular_Static":
+        elif self.mode == "Cellular_Static":
             self.cellular_freq_range = (U6_START, U6_END)
             self.wifi_freq_range = (0, 0)
 
-        elif config.MODE == "Wifi_Static":
+        elif self.mode == "Wifi_Static":
             self.wifi_freq_range = (U6_START, U6_END)
             self.cellular_freq_range = (0, 0)
 
-        elif config.MODE == "Static_Range":
-            wifi_end = U6_START + (U6_END - U6_START) * (config.spectrum_split / 100)
+        elif self.mode == "Static_Range":
+            wifi_end = U6_START + (U6_END - U6_START) * (self.spectrum_split / 100)
             self.wifi_freq_range = (U6_START, wifi_end)
             self.cellular_freq_range = (wifi_end, U6_END) 
 
-"""
-STEP 2: Placing BS and HS 
-"""
-db = Database()
-unit_id = 0
-block_size = 10
-grid_size = 100
-
-for i in range(city_size[0]):
-    for j in range(city_size[1]):
-        pop_density = population_density[i, j]
-        traffic_demand = 0
-        # setting the number of hs and bs acc to density [TODO]
-        if pop_density == 2:
-            hs_count = 7  #100x more 
-            bs_count = 5 #5
-        elif pop_density == 1:
-            hs_count = 5   #5
-            bs_count = 2   #2
-        else:
-            hs_count = 3  #3
-            bs_count = 1  #1
-
-        coordinates = set()
-        for _ in range (hs_count):
-            x_pos = random.randint(j * block_size, (j + 1) * block_size - 1)
-            y_pos = random.randint(i * block_size, (i + 1) * block_size - 1)
+class HistoryStore:
+    """
+    Append-only history of the per-unit demand, bandwidth and congested columns.
+    Each recorded snapshot is one row ("frame") of a preallocated np.memmap file
+    per column, so memory use stays flat however many years are simulated.
+    index.npy maps frame number -> (year, day, snapshot).
+    """
+    COLUMNS = {
+        "traffic_demand": np.int64,
+        "bandwidth": np.float32,
+        "congested": np.bool_,
+    }
 
-            # no 2 units can have the same coords 
-            while (x_pos, y_pos) in coordinates:
-                x_pos = random.randint(j * block_size, (j + 1) * block_size - 1)
-                y_pos = random.randint(i * block_size, (i + 1) * block_size - 1)
+    def __init__(self, path, num_units, num_frames, mode="w+"):
+        self.path = path
+        self.num_units = num_units
+        self.num_frames = num_frames
+        if mode == "w+":
+            os.makedirs(path, exist_ok=True)
+            self.index = np.full((num_frames, 3), -1, dtype=np.int32)
+            self.count = 0
+        else:
+            self.index = np.load(os.path.join(path, "index.npy"))
+            self.count = int(np.count_nonzero(self.index[:, 0] >= 0))
+        self.columns = {
+            name: np.memmap(os.path.join(path, f"{name}.dat"), dtype=dtype, mode=mode,
+                            shape=(max(num_frames, 1), max(num_units, 1)))
+            for name, dtype in self.COLUMNS.items()
+        }
 
-            assert ((x_pos, y_pos) not in coordinates)
-            coordinates.add((x_pos, y_pos))
+    @classmethod
+    def open(cls, path):
+        """Opens a finished history read-only."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(path, meta["num_units"], meta["num_frames"], mode="r")
+
+    def append(self, year, day, snapshot, units):
+        frame = self.count
+        assert frame < self.num_frames, f"[HistoryStore][append]: History at {self.path} is full ({self.num_frames} frames)."
+        for name, column in self.columns.items():
+            column[frame, :self.num_units] = getattr(units, name)
+        self.index[frame] = (year, day, snapshot)
+        self.count += 1
+
+    def frames(self, name):
+        """Returns the recorded (frames x units) array of one column."""
+        return self.columns[name][:self.count, :self.num_units]
+
+    def frame_index(self):
+        return self.index[:self.count]
+
+    def year_end_frames(self):
+        """Returns the last recorded frame number of every year."""
+        years = self.frame_index()[:, 0]
+        return np.flatnonzero(np.append(years[1:] != years[:-1], True))
+
+    def truncate(self, count):
+        """Forgets every frame after the first count."""
+        self.index[count:] = -1
+        self.count = count
+
+    def extend(self, source, count, chunk=256):
+        """Appends the first count frames of another history."""
+        assert self.count + count <= self.num_frames, f"[HistoryStore][extend]: History at {self.path} is too small."
+        for start in range(0, count, chunk):
+            stop = min(start + chunk, count)
+            for name, column in self.columns.items():
+                column[self.count + start:self.count + stop, :self.num_units] = source.columns[name][start:stop, :self.num_units]
+        self.index[self.count:self.count + count] = source.index[:count]
+        self.count += count
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+        np.save(os.path.join(self.path, "index.npy"), self.index)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"num_units": self.num_units, "num_frames": self.num_frames}, f)
 
-            db.database[unit_id] = NetworkUnit(unit_id, (x_pos, y_pos), traffic_demand, UnitType.HS, pop_density) 
-            unit_id += 1
 
+"""
+STEP 2: Placing BS and HS 
+"""
+def sample_block_cells(num_blocks, num_cells, count, rng):
+    """
+    Draws count distinct cell indices in [0, num_cells) for each of num_blocks
+    blocks at once, in random order. Uses Floyd's algorithm, so each block takes
+    exactly count draws however full it gets (no rejection / retry loop).
+    """
+    assert count <= num_cells, f"[sample_block_cells]: Can't place {count} units in a block of {num_cells} cells."
+    cells = np.empty((num_blocks, count), dtype=np.int64)
+    for step, t in enumerate(range(num_cells - count, num_cells)):
+        draw = rng.integers(0, t + 1, size=num_blocks)
+        taken = (cells[:, :step] == draw[:, None]).any(axis=1)
+        cells[:, step] = np.where(taken, t, draw)
 
-        for _ in range (bs_count):
-            x_pos = random.randint(j * block_size, (j + 1) * block_size - 1)
-            y_pos = random.randint(i * block_size, (i + 1) * block_size - 1)
+    # Floyd's algorithm picks a uniform subset but not a uniform order
+    order = np.argsort(rng.random((num_blocks, count)), axis=1)
+    return np.take_along_axis(cells, order, axis=1)
 
-            # no 2 units can have the same coords 
-            while (x_pos, y_pos) in coordinates:
-                x_pos = random.randint(j * block_size, (j + 1) * block_size - 1)
-                y_pos = random.randint(i * block_size, (i + 1) * block_size - 1)
 
-            assert ((x_pos, y_pos) not in coordinates)
-            coordinates.add((x_pos, y_pos))
+def place_units(units, population_density, block_size, hs_per_density, bs_per_density, rng):
+    """
+    Places the HS and BS of every block of the city at distinct cells of that
+    block; hs/bs_per_density map a density level to the unit count per block and
+    rng is a numpy Generator. Units are added block by block (row-major), HS
+    before BS within a block.
+    """
+    rows, cols = population_density.shape
+    block_density = population_density.ravel()
+    hs_count = np.array([hs_per_density[d] for d in range(3)])[block_density]
+    bs_count = np.array([bs_per_density[d] for d in range(3)])[block_density]
+    block_units = hs_count + bs_count
+    block_start = np.cumsum(block_units) - block_units
+    num_units = int(block_units.sum())
+
+    positions = np.empty((num_units, 2), dtype=np.int32)
+    unit_types = np.empty(num_units, dtype=np.int8)
+    densities = np.repeat(block_density, block_units)
+
+    for d in range(3):
+        blocks = np.flatnonzero(block_density == d)
+        count = hs_per_density[d] + bs_per_density[d]
+        if len(blocks) == 0 or count == 0:
+            continue
+        cells = sample_block_cells(len(blocks), block_size * block_size, count, rng)
 
-            db.database[unit_id] = NetworkUnit(unit_id, (x_pos, y_pos), traffic_demand, UnitType.BS, pop_density) 
-            unit_id += 1
+        i, j = np.divmod(blocks, cols)
+        ids = block_start[blocks][:, None] + np.arange(count)
+        positions[ids, 0] = j[:, None] * block_size + cells % block_size
+        positions[ids, 1] = i[:, None] * block_size + cells // block_size
+        unit_types[ids] = np.where(np.arange(count) < hs_per_density[d], UnitType.HS.value, UnitType.BS.value)
 
+    return units.add_units(positions, unit_types, densities)
 
-for u in db.database.values():
-    if u.unit_type == UnitType.HS:
-        total_num_hs += 1
-    elif u.unit_type == UnitType.BS:
-        total_num_bs += 1
 
 """
-STEP 3: Make a group dictionary 
+STEP 3: Group interfering units
 """
-# Maps group_id to a list of unit id 
-# every unit in the list is within D_w/ D_c of each other 
-#  BFS-style flood fill 
+# Two units of the same type interfere when they are within D_w (HS) / D_c (BS)
+# of each other. Groups are the connected components of that interference graph,
+# so every unit in a group is reachable from every other through close neighbors.
 # A = 1/2, B =1/3, C = 1/2
 
-group_dict = {}  # Stores unit_id -> group_id mapping
-group_freq_dict = {}  # group_id -> total frequency ,a[[ing]]
-group_members_dict = {}  # group_id -> list of unit_ids
-grid = defaultdict(set)  # Spatial hash map (grid-based indexing)
-group_id = 0  # Counter for group IDs
-
-def get_grid_cell(x, y, cell_size):
-    """Returns the grid cell coordinates for a given position."""
-    return (x // cell_size, y // cell_size)
-
-# Step 1: Populate the spatial grid
-for unit_id in db.database:
-    unit = db.database[unit_id]
-    x, y = unit.position
-    cell = get_grid_cell(x, y, D_w)
-    grid[cell].add(unit_id)
-
-# Step 2: Group units by checking only nearby grid cells
-def assign_group():
-    bs_units = [unit for unit in db.database.values() if unit.unit_type == UnitType.BS]
-    hs_units = [unit for unit in db.database.values() if unit.unit_type == UnitType.HS]
-
-    # Create k-d trees for BS and HS units
-    bs_positions = [unit.position for unit in bs_units]
-    hs_positions = [unit.position for unit in hs_units]
-    
-    bs_tree = KDTree(bs_positions)
-    hs_tree = KDTree(hs_positions)
-    
-    # For BS units
-    for i, unit in enumerate(bs_units):
-        # Query k-d tree for BS units within distance D_w
-        indices = bs_tree.query_ball_point(unit.position, D_w)  # Returns indices of nearby units
-        group_dict[unit.id] = [bs_units[i].id for i in indices if bs_units[i] != unit]  
-
-    # For HS units
-    for i, unit in enumerate(hs_units):
-        # Query k-d tree for HS units within distance D_c
-        indices = hs_tree.query_ball_point(unit.position, D_c)  # Returns indices of nearby units
-        group_dict[unit.id] = [hs_units[i].id for i in indices if hs_units[i] != unit]  
-
-def group_units(units, distance_threshold):
-    if not units:
-        return []
-    
-    positions = [unit.position for unit in units]
-    tree = KDTree(positions)
+def symmetric_adjacency(rows, cols, num_units):
+    """Symmetric sparse (CSR) adjacency matrix over num_units unit ids with the edges rows - cols."""
+    from scipy.sparse import coo_matrix
 
-    visited = set()
-    groups = []
+    adjacency = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(num_units, num_units))
+    return (adjacency + adjacency.T).tocsr()
 
-    for idx, unit in enumerate(units):
-        if idx in visited:
+def number_groups_by_lowest_id(labels):
+    """
+    Renumbers group labels 0, 1, ... in order of each group's lowest unit id,
+    like scipy's connected_components numbers them. Returns (labels, num_groups).
+    """
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    return rank[inverse], len(first)
+
+def assign_group(units, D_w, D_c):
+    """
+    Builds the interference graph as a symmetric sparse adjacency matrix over
+    unit ids. HS pairs are linked within D_w and BS pairs within D_c.
+    """
+    from scipy.spatial import cKDTree
+
+    rows, cols = [], []
+    for unit_type, threshold in ((UnitType.HS, D_w), (UnitType.BS, D_c)):
+        ids = np.flatnonzero(units.mask(unit_type))
+        if len(ids) < 2:
             continue
-        # Find all neighbors within distance_threshold
-        indices = tree.query_ball_point(unit.position, distance_threshold)
-        group = [units[i] for i in indices if i not in visited]
-        visited.update(indices)
-        groups.append(group)
+        pairs = cKDTree(units.position[ids]).query_pairs(threshold, output_type="ndarray")
+        rows.append(ids[pairs[:, 0]])
+        cols.append(ids[pairs[:, 1]])
 
-    return groups
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+    return symmetric_adjacency(rows, cols, len(units))
+
+def neighbors(adjacency, unit_id):
+    """Returns the ids of the units that interfere with unit_id."""
+    return adjacency.indices[adjacency.indptr[unit_id]:adjacency.indptr[unit_id + 1]]
 
 def get_frequency_allocated(unit):
     """Returns total frequency allocated to a unit in MHz."""
@@ -398,110 +793,431 @@ def get_frequency_allocated(unit):
     return total
 
 
-def find_groups_and_sum_frequencies():
-    visited = set()
-    group_id = 0
+def frequency_allocated(units):
+    """Returns the total frequency allocated to every unit in MHz, as an array."""
+    totals = np.zeros(len(units))
+    for unit_id in list(units.frequency_bands):
+        totals[unit_id] = get_frequency_allocated(NetworkUnit(units, unit_id))
+    return totals
 
-    for unit_id in group_dict:
-        if unit_id not in visited:
-            # Start BFS for new group
-            queue = deque([unit_id])
-            group_members = set()
+def find_groups_and_sum_frequencies(units, adjacency):
+    """
+    Labels every unit with the connected component of the interference graph
+    it belongs to, and returns group_id -> total frequency allocated (MHz).
+    """
+    from scipy.sparse.csgraph import connected_components
 
-            while queue:
-                current = queue.popleft()
-                if current not in visited:
-                    visited.add(current)
-                    group_members.add(current)
-                    for neighbor in group_dict[current]:
-                        if neighbor not in visited:
-                            queue.append(neighbor)
+    num_groups, labels = connected_components(adjacency, directed=False)
+    units.group_id = labels
+    return np.bincount(labels, weights=frequency_allocated(units), minlength=num_groups)
 
-            # Assign frequency sum
-            total_freq = sum(get_frequency_allocated(db.database[uid]) for uid in group_members)
-            group_freq_dict[group_id] = total_freq
-            group_members_dict[group_id] = group_members
+def sum_group_frequencies(units):
+    """Returns group_id -> total frequency allocated (MHz) for the groups numbered in units.group_id."""
+    return np.bincount(units.group_id, weights=frequency_allocated(units))
 
-            for uid in group_members:
-                db.database[uid].group_id = group_id
+def merge_groups(labels, num_groups, rows, cols):
+    """
+    Batched union-find step: merges the groups that the edges rows - cols join.
+    Returns the new labels and group count.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
 
-            group_id += 1
+    if len(rows) == 0:
+        return labels, num_groups
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (labels[rows], labels[cols])), shape=(num_groups, num_groups))
+    num_groups, merged = connected_components(graph, directed=False)
+    return merged[labels], num_groups
+
+class GroupSweep:
+    """
+    Interference groups of one city for many (D_w, D_c) values in one pass.
+    On first use, the pairs of each unit type within max_D_w / max_D_c are found
+    once and sorted by distance. The partition for a threshold then grows
+    Kruskal-style from the previous (smaller) one by merging only the edges in
+    between, so a sweep costs one KD-tree query instead of one per threshold.
+
+        sweep = GroupSweep(max_D_w=5, max_D_c=5)
+        for D_w, D_c in distances:
+            adjacency, group_freq = sweep.apply(db.units, D_w, D_c)
+
+    apply() gives the same adjacency, group ids and group totals as
+    assign_group + find_groups_and_sum_frequencies; groups() gives the group
+    ids and adjacency without touching the units, e.g. to hand them to a
+    Simulation in another process. Every call must be for the same units
+    (e.g. Simulations with the same SEED, REPLICA and city settings).
+    """
+    def __init__(self, max_D_w, max_D_c):
+        self.max_thresholds = {UnitType.HS: max_D_w, UnitType.BS: max_D_c}
+        self.positions = None
+        self.ids = {}        # unit type -> ids of the units of that type
+        self.edges = {}      # unit type -> (distances, rows, cols) sorted by distance, rows / cols index ids
+        self._grown = {}     # unit type -> (edges merged, labels, num_groups) of the last partition grown
+        self._partitions = {} # (unit type, threshold) -> (labels, num_groups)
+
+    def _build(self, units):
+        from scipy.spatial import cKDTree
+
+        self.positions = units.position.copy()
+        for unit_type, max_threshold in self.max_thresholds.items():
+            ids = np.flatnonzero(units.mask(unit_type))
+            positions = units.position[ids]
+            pairs = cKDTree(positions).query_pairs(max_threshold, output_type="ndarray") if len(ids) > 1 \
+                else np.empty((0, 2), dtype=np.intp)
+            distances = np.hypot(*(positions[pairs[:, 0]] - positions[pairs[:, 1]]).T.astype(np.float64))
+            order = np.argsort(distances, kind="stable")
+            self.ids[unit_type] = ids
+            self.edges[unit_type] = (distances[order], pairs[order, 0], pairs[order, 1])
+
+    def partition(self, unit_type, threshold):
+        """(labels, num_groups) of the units of unit_type (indexed like ids[unit_type]) with links up to threshold."""
+        key = (unit_type, threshold)
+        if key not in self._partitions:
+            assert threshold <= self.max_thresholds[unit_type], \
+                f"[GroupSweep][partition]: {threshold} is beyond the swept distance {self.max_thresholds[unit_type]}."
+            distances, rows, cols = self.edges[unit_type]
+            count = int(np.searchsorted(distances, threshold, side="right"))
+            merged, labels, num_groups = self._grown.get(unit_type, (0, None, 0))
+            if labels is None or count < merged:
+                num_groups = len(self.ids[unit_type])
+                merged, labels = 0, np.arange(num_groups)
+            labels, num_groups = merge_groups(labels, num_groups, rows[merged:count], cols[merged:count])
+            self._grown[unit_type] = (count, labels, num_groups)
+            self._partitions[key] = (labels, num_groups)
+        return self._partitions[key]
+
+    def apply(self, units, D_w, D_c):
+        """Labels units.group_id for (D_w, D_c); returns the adjacency matrix and group_id -> total frequency allocated."""
+        units.group_id, adjacency = self.groups(units, D_w, D_c)
+        return adjacency, sum_group_frequencies(units)
+
+    def groups(self, units, D_w, D_c):
+        """Returns (group_id of every unit, adjacency matrix) for (D_w, D_c)."""
+        if self.positions is None:
+            self._build(units)
+        assert np.array_equal(units.position, self.positions), "[GroupSweep][groups]: Units differ from the swept ones."
+
+        labels = np.empty(len(units), dtype=np.int64)
+        rows, cols = [], []
+        offset = 0
+        for unit_type, threshold in ((UnitType.HS, D_w), (UnitType.BS, D_c)):
+            ids = self.ids[unit_type]
+            type_labels, num_groups = self.partition(unit_type, threshold)
+            labels[ids] = type_labels + offset
+            offset += num_groups
+            distances, type_rows, type_cols = self.edges[unit_type]
+            count = np.searchsorted(distances, threshold, side="right")
+            rows.append(ids[type_rows[:count]])
+            cols.append(ids[type_cols[:count]])
+
+        group_id, _ = number_groups_by_lowest_id(labels)
+        return group_id, symmetric_adjacency(np.concatenate(rows), np.concatenate(cols), len(units))
 
-        
-# Step 3: Process all units and assign groups
-assign_group()
-find_groups_and_sum_frequencies()
 
 
 """
 STEP 6: Allocate spectrum according to the rules for HS and BS based on distance 
 """
-# TODO: Swati
-def allocate_spectrum(unit, bandwidth):
-    unit.congested = False
-
-    if len(group_dict[unit.id]) > 0:
-        if unit.unit_type == UnitType.HS:
-            groupID = unit.group_id
-            total_freq_allocated = group_freq_dict[groupID]
-
-            if (bandwidth+total_freq_allocated) <= ((db.wifi_freq_range[1]-db.wifi_freq_range[0])*1000):
-                unit.bandwidth = bandwidth
-                group_freq_dict[groupID] += bandwidth
-
-            else: 
-                unit.bandwidth = bandwidth / (total_freq_allocated + bandwidth) * ((db.wifi_freq_range[1]-db.wifi_freq_range[0])*1000)  
-                for member in group_members_dict[unit.group_id]:
-                    if member == unit.id:
-                        continue
-                    member_unit = db.database[member]
-                    member_unit.bandwidth = member_unit.bandwidth / (total_freq_allocated + bandwidth) * ((db.wifi_freq_range[1]-db.wifi_freq_range[0])*1000)
-
-        elif unit.unit_type == UnitType.BS:
-            groupID = unit.group_id
-            total_freq_allocated = group_freq_dict[groupID]
-
-            if (bandwidth+total_freq_allocated) <= ((db.cellular_freq_range[1]-db.cellular_freq_range[0])*1000):
-                unit.bandwidth = bandwidth
-                group_freq_dict[groupID] += bandwidth
-
-            else: 
-                unit.bandwidth = bandwidth / (total_freq_allocated + bandwidth) * ((db.cellular_freq_range[1]-db.cellular_freq_range[0])*1000)
-                # reallocating the other unit's bandwidths
-                for member in group_members_dict[unit.group_id]:
-                    if member == unit.id:
-                        continue
-                    member_unit = db.database[member]
-                    member_unit.bandwidth = member_unit.bandwidth / (total_freq_allocated + bandwidth) * ((db.cellular_freq_range[1]-db.cellular_freq_range[0])*1000)
-            
-            
+def drain_requests(request_queue):
+    """Empties the request buffer into (unit_ids, bandwidths) arrays, in first-request order."""
+    return request_queue.drain()
+
+def allocate_spectrum(db, group_freq, unit_ids, bandwidths, rescale_members=True):
+    """
+    Serves every request of a snapshot in one pass.
+
+    unit_ids / bandwidths hold one request (MHz) per requesting unit. group_freq
+    holds the committed bandwidth (MHz) of every group and is updated in place.
+    With rescale_members=False an overflowing group only scales its requesters
+    and leaves the other members alone (used for retries, which must not shrink
+    the neighbors again every time they are re-evaluated).
+
+    Per-group demand totals are segment sums (np.bincount over group ids):
+      - isolated units (no neighbors) get the whole range of their type
+      - if a group's committed total plus all of this snapshot's requests fits
+        in the range, every requester gets what it asked for and the group's
+        committed total grows by the requests
+      - otherwise the group overflows: requesters get request * capacity / total
+        demanded, every other member is rescaled by the same factor and the
+        committed total is left unchanged
+
+    This matches the old one-request-at-a-time drain exactly whenever no group
+    overflows. On overflow the sequential drain rescaled the group once per
+    request in queue order; here the group is rescaled once by the
+    order-independent factor, and the congested flag of every rescaled member
+    is refreshed too (the sequential drain only refreshed the requester's).
+    """
+    units = db.units
+    wifi_capacity = (db.wifi_freq_range[1] - db.wifi_freq_range[0]) * 1000
+    cellular_capacity = (db.cellular_freq_range[1] - db.cellular_freq_range[0]) * 1000
+
+    num_groups = len(group_freq)
+    group_sizes = np.bincount(units.group_id, minlength=num_groups)
+    group_is_hs = np.zeros(num_groups, dtype=bool)
+    group_is_hs[units.group_id] = units.unit_type == UnitType.HS.value
+    group_capacity = np.where(group_is_hs, wifi_capacity, cellular_capacity)
+
+    request_groups = units.group_id[unit_ids]
+    isolated = group_sizes[request_groups] == 1
+
+    # Isolated units get the full range of their type
+    isolated_ids = unit_ids[isolated]
+    is_hs = units.unit_type[isolated_ids] == UnitType.HS.value
+    units.bandwidth[isolated_ids] = np.where(is_hs, wifi_capacity, cellular_capacity)
+    units.limit[isolated_ids] = np.where(is_hs,
+                                         round(db.wifi_freq_range[1] - db.wifi_freq_range[0], 3),
+                                         round(db.cellular_freq_range[1] - db.cellular_freq_range[0], 3))
+
+    # Grouped units share their group's range in proportion to demand
+    shared_ids = unit_ids[~isolated]
+    shared_groups = request_groups[~isolated]
+    shared_bandwidths = bandwidths[~isolated]
+
+    requested = np.bincount(shared_groups, weights=shared_bandwidths, minlength=num_groups)
+    demanded = group_freq + requested
+    overflow = (requested > 0) & (demanded > group_capacity)
+
+    group_freq[~overflow] += requested[~overflow]
+    scale = np.ones(num_groups)
+    scale[overflow] = group_capacity[overflow] / demanded[overflow]
+
+    if rescale_members:
+        rescaled = overflow[units.group_id]
+        units.bandwidth[rescaled] *= scale[units.group_id[rescaled]]
     else:
-        if unit.unit_type == UnitType.HS:
-            unit.bandwidth = (db.wifi_freq_range[1]-db.wifi_freq_range[0])*1000
-        else:
-            unit.bandwidth = (db.cellular_freq_range[1]-db.cellular_freq_range[0])*1000
-        unit.limit = round((db.cellular_freq_range[1]-db.cellular_freq_range[0]), 3) if unit.unit_type == UnitType.BS else round((db.wifi_freq_range[1]-db.wifi_freq_range[0]), 3)
+        rescaled = np.zeros(len(units), dtype=bool)
+    units.bandwidth[shared_ids] = shared_bandwidths * scale[shared_groups]
 
-    unit.congested = unit.bandwidth < unit.traffic_demand / 2
+    refreshed = rescaled.copy()
+    refreshed[unit_ids] = True
+    units.congested[refreshed] = units.bandwidth[refreshed] < units.traffic_demand[refreshed] / 2
 
 
+def first_fit(busy, low, high, width):
+    """
+    Returns the lowest (start, end) of the given width in [low, high] that does
+    not overlap any of the sorted busy intervals. If no gap is wide enough, the
+    widest gap is returned instead (end - start < width).
+    """
+    cursor = low
+    best_start, best_width = low, 0.0
+    for busy_start, busy_end in busy:
+        gap = busy_start - cursor
+        if gap >= width - 1e-12:
+            return cursor, cursor + width
+        if gap > best_width:
+            best_start, best_width = cursor, gap
+        cursor = max(cursor, busy_end)
+
+    gap = high - cursor
+    if gap >= width - 1e-12:
+        return cursor, cursor + width
+    if gap > best_width:
+        best_start, best_width = cursor, gap
+    return best_start, best_start + best_width
+
+def assign_channels(units, adjacency, wifi_freq_range, cellular_freq_range):
+    """
+    Maps every unit's granted bandwidth (MHz) to a concrete band (GHz) inside
+    the range of its type, such that no two interfering units overlap, and
+    stores it in units.frequency_bands. Returns the (starts, ends) arrays, NaN
+    for units without a band, and a mask of the units whose band is narrower
+    than their bandwidth.
+
+    Greedy interval coloring of the interference graph: units are visited
+    widest first and each takes the lowest gap left by its already placed
+    neighbors. Isolated units simply start at the bottom of their range.
+    When the neighbors' bands leave no gap wide enough, the unit gets the
+    widest gap available, so its band can be narrower than its bandwidth.
+    """
+    num_units = len(units)
+    is_hs = units.unit_type == UnitType.HS.value
+    low = np.where(is_hs, wifi_freq_range[0], cellular_freq_range[0])
+    high = np.where(is_hs, wifi_freq_range[1], cellular_freq_range[1])
+    widths = np.minimum(units.bandwidth / 1000, high - low) # MHz -> GHz
+    degree = np.diff(adjacency.indptr)
+    active = widths > 0
+
+    starts = np.full(num_units, np.nan)
+    ends = np.full(num_units, np.nan)
+
+    isolated = active & (degree == 0)
+    starts[isolated] = low[isolated]
+    ends[isolated] = low[isolated] + widths[isolated]
+
+    grouped = np.flatnonzero(active & (degree > 0))
+    order = grouped[np.argsort(-widths[grouped], kind="stable")]
+
+    indptr, indices = adjacency.indptr.tolist(), adjacency.indices.tolist()
+    low, high, widths = low.tolist(), high.tolist(), widths.tolist()
+    start_list, end_list = starts.tolist(), ends.tolist()
+    placed = isolated.tolist()
+    for unit_id in order.tolist():
+        busy = sorted((start_list[v], end_list[v])
+                      for v in indices[indptr[unit_id]:indptr[unit_id + 1]] if placed[v])
+        start_list[unit_id], end_list[unit_id] = first_fit(busy, low[unit_id], high[unit_id], widths[unit_id])
+        placed[unit_id] = True
+
+    starts[:] = start_list
+    ends[:] = end_list
+    narrowed = np.zeros(num_units, dtype=bool)
+    narrowed[grouped] = ends[grouped] - starts[grouped] < np.asarray(widths)[grouped] - 1e-12
+    assigned = np.flatnonzero(~np.isnan(starts))
+    units.frequency_bands = defaultdict(set, {
+        unit_id: {(start, end)}
+        for unit_id, start, end in zip(assigned.tolist(), starts[assigned].tolist(), ends[assigned].tolist())
+    })
+    return starts, ends, narrowed
+
+def spectral_reuse(units, starts, ends, unit_type, freq_range):
+    """
+    Total band width assigned to units of this type divided by the width of the
+    type's range, i.e. how many times the range is reused across the city.
+    """
+    range_width = freq_range[1] - freq_range[0]
+    if range_width <= 0:
+        return 0.0
+    mask = units.mask(unit_type)
+    return float(np.nansum(ends[mask] - starts[mask]) / range_width)
 
-def print_database_state(db, group_dict):
+class RequestScheduler:
     """
-    Prints the current state of the database in a tabular format.
+    Serves a snapshot's requests over time instead of in one pass.
+
+    Every request arrives at a random time within the snapshot. Every
+    tick_hours (and at the end of the snapshot) the database serves everything
+    that has arrived with allocate_spectrum. A request that gets less than it
+    asked for is retried on the next tick, up to max_retries times. Requests
+    expire after ttl_hours, and at the end of the snapshot, since demand is
+    redrawn for the next one.
+
+    Retries are served before the tick's new arrivals and are only
+    re-evaluated against the group's current committed total: the other
+    members of an overflowing group were already rescaled when the request
+    first arrived and are not rescaled again. A group's committed total only
+    grows within a snapshot, so a retry succeeds only when its group's retried
+    requests now fit, i.e. when fewer of them are pending than collided before
+    (the others were granted, expired or ran out of retries).
+
+    Arrival times are drawn from rng, which defaults to the "requests" stream
+    of config.SEED / config.REPLICA.
+    """
+    def __init__(self, tick_hours=1, max_retries=3, ttl_hours=4, rng=None):
+        assert tick_hours > 0, f"[RequestScheduler]: tick_hours must be positive, got {tick_hours}."
+        self.tick_hours = tick_hours
+        self.max_retries = max_retries
+        self.ttl_hours = ttl_hours
+        self.rng = rng if rng is not None else default_stream("requests")
+        self.scheduler = events.EventScheduler()
+
+    def run_snapshot(self, db, group_freq, start, duration, unit_ids, bandwidths):
+        """
+        Runs the ticks of the snapshot [start, start + duration) (hours) for the
+        given requests and returns the snapshot's queue stats.
+        """
+        end = start + duration
+        ticks = np.arange(1, math.ceil(duration / self.tick_hours) + 1) * self.tick_hours + start
+        ticks[-1] = end
+
+        arrivals = start + self.rng.random(len(unit_ids)) * duration
+        self.scheduler.schedule_batch(arrivals, "arrival", (unit_ids, bandwidths), ticks)
+        for tick in ticks.tolist():
+            self.scheduler.schedule(tick, "tick", priority=1)
+
+        empty = np.empty(0)
+        pending = {"ids": empty.astype(np.int64), "bws": empty, "arrived": empty, "attempts": empty.astype(np.int64)}
+        stats = {"request_ticks": 0, "requests_granted": 0, "request_retries": 0, "requests_expired": 0}
+        latency = []
+
+        def on_arrival(time, payload):
+            arrived, ids, bws = payload
+            pending["ids"] = np.concatenate((pending["ids"], ids))
+            pending["bws"] = np.concatenate((pending["bws"], bws))
+            pending["arrived"] = np.concatenate((pending["arrived"], arrived))
+            pending["attempts"] = np.concatenate((pending["attempts"], np.zeros(len(ids), dtype=np.int64)))
+
+        def on_tick(time, payload):
+            stats["request_ticks"] += 1
+            expired = pending["arrived"] + self.ttl_hours < time
+            stats["requests_expired"] += int(np.count_nonzero(expired))
+            for key in pending:
+                pending[key] = pending[key][~expired]
+            if len(pending["ids"]) == 0:
+                return
+
+            retried = pending["attempts"] > 0
+            if retried.any():
+                allocate_spectrum(db, group_freq, pending["ids"][retried], pending["bws"][retried], rescale_members=False)
+            if not retried.all():
+                allocate_spectrum(db, group_freq, pending["ids"][~retried], pending["bws"][~retried])
+            granted = db.units.bandwidth[pending["ids"]] >= pending["bws"] * (1 - 1e-9)
+            stats["requests_granted"] += int(np.count_nonzero(granted))
+            latency.append(time - pending["arrived"][granted])
+
+            pending["attempts"] += 1
+            retry = ~granted & (pending["attempts"] <= self.max_retries)
+            stats["request_retries"] += int(np.count_nonzero(retry))
+            stats["requests_expired"] += int(np.count_nonzero(~granted & ~retry))
+            for key in pending:
+                pending[key] = pending[key][retry]
+
+        self.scheduler.run_until(end, {"arrival": on_arrival, "tick": on_tick})
+        stats["requests_expired"] += len(pending["ids"])
+
+        latency = np.concatenate(latency) if latency else empty
+        stats["mean_request_latency_h"] = float(latency.mean()) if len(latency) else 0.0
+        return stats
+
+
+
+def format_database_state(units, adjacency):
+    """
+    Returns the current state of the units in a tabular format.
     """
     header = f"\n\n\n{'ID':<5}{'Type':<10}{'Position':<15}{'Traffic Demand (Mbps)':<30}{'Bandwidth (MHz)':<20}{'Congested':<10}{'Density':<10}{'Group Members':<20}"
-    print(header)
-    print("-" * len(header))
+    lines = [header, "-" * len(header)]
 
-    for unit in db.database.values():
+    for unit in UnitStoreView(units).values():
         
-        group_str = ', '.join(map(str, group_dict.get(unit.id, [])))
+        group_str = ', '.join(map(str, neighbors(adjacency, unit.id).tolist()))
         
-        print(f"{unit.id:<5}{unit.unit_type.name:<10}{str(unit.position):<15}{unit.traffic_demand:<30}"
-              f"{unit.bandwidth:<20.2f}{str(unit.congested):<10}{unit.density:<10}{group_str:<20}")
+        lines.append(f"{unit.id:<5}{unit.unit_type.name:<10}{str(unit.position):<15}{unit.traffic_demand:<30}"
+                     f"{unit.bandwidth:<20.2f}{str(unit.congested):<10}{unit.density:<10}{group_str:<20}")
     
-    print("\n")
+    lines.append("\n")
+    return "\n".join(lines)
+
+def print_database_state(db, adjacency):
+    """
+    Prints the current state of the database in a tabular format.
+    """
+    print(format_database_state(db.units, adjacency))
+
+def format_snapshot_record(record):
+    return "\n".join([
+        f"    Snapshot {record['snapshot'] + 1}:",
+        f"Avg HS demand: {record['avg_hs_demand']}",
+        f"Avg BS demand: {record['avg_bs_demand']}",
+        "",
+        f"---- Time Step Diagnostic (Wi-Fi Fraction = {record['wifi_range']:.2f}) ----",
+        f"Total Wi-Fi Demand: {record['total_wifi_demand']:.2f} Mbps",
+        f"Total Cellular Demand: {record['total_cellular_demand']:.2f} Mbps",
+        f"Avg Demand per Hotspot: {record['avg_hs_demand']:.2f} Mbps",
+        f"Avg Demand per Base Station: {record['avg_bs_demand']:.2f} Mbps",
+        f"Number of Wi-Fi Groups: {record['num_hs_groups']}",
+        f"Average Hotspot Group Size: {record['avg_hs_group_size']:.2f}",
+        f"Number of Cellular Groups: {record['num_bs_groups']}",
+        f"Average Base Station Group Size: {record['avg_bs_group_size']:.2f}",
+    ] + ([
+        f"Wi-Fi Spectral Reuse: {record['hs_spectral_reuse']:.2f}x",
+        f"Cellular Spectral Reuse: {record['bs_spectral_reuse']:.2f}x",
+    ] if "hs_spectral_reuse" in record else []))
+
+def format_year_record(record):
+    return (f"Year {record['year'] + 1}: "
+            f"HS congested {record['congested_hs_percent']:.2f}%, BS congested {record['congested_bs_percent']:.2f}%, "
+            f"Wi-Fi demand met {record['percent_traffic_demand_met_hs']:.2f}%, "
+            f"cellular demand met {record['percent_traffic_demand_met_bs']:.2f}%")
 
 
 def get_snapshot_duration(snapshot):
@@ -522,6 +1238,9 @@ def get_snapshot_duration(snapshot):
         case 5: return 5
     return 0
 
+# hour of the day each snapshot starts at
+SNAPSHOT_START_HOURS = [0, 8, 12, 15, 17, 19]
+
 def calc_unserviced_traffic_demand(unit):
     desired_bw = unit.traffic_demand / 2
     allocated_bw = unit.bandwidth
@@ -529,192 +1248,191 @@ def calc_unserviced_traffic_demand(unit):
     unserviced_bw = desired_bw - allocated_bw
     unserviced_traffic_demand = unserviced_bw * 2
     return max(0, unserviced_traffic_demand)
-    
 
-# Store yearly stats
-yearly_stats = {
-    "congested_hs_percent": [],
-    "congested_bs_percent": [],
-    "percent_traffic_demand_met_hs": [],
-    "percent_traffic_demand_met_bs": []
+def unserviced_traffic_demand(units):
+    """calc_unserviced_traffic_demand of every unit at once."""
+    return np.maximum(0, (units.traffic_demand / 2 - units.bandwidth) * 2)
+
+# column summed per (density, unit type) by aggregate_units; "units" counts the units
+AGGREGATE_COLUMNS = {
+    "units": lambda units: None,
+    "congested": lambda units: units.congested,
+    "demand": lambda units: units.traffic_demand,
+    "granted": lambda units: units.bandwidth,
+    "met": lambda units: np.minimum(units.traffic_demand / 2, units.bandwidth),
+    "unserviced": lambda units: np.where(units.congested, unserviced_traffic_demand(units), 0),
 }
+AGGREGATE_FIELDS = list(AGGREGATE_COLUMNS)
 
-def generate_report(year, total_num_hs, total_num_bs):
-    with open(report_file_path, "a") as f:
-        f.write(f"\n\n\n=============================================================================\n")
-        f.write(f"================================== Year {year} ==================================\n")
-        f.write(f"=============================================================================\n")
-
-        num_congested_hs = 0
-        num_congested_bs = 0
-
-        hs_congestion = {}
-        bs_congestion = {}
-
-        sum_desired_hs, sum_allocated_hs = 0, 0
-        sum_desired_bs, sum_allocated_bs = 0, 0
-
-        for unit in db.database.values():
-            if unit.unit_type == UnitType.HS:
-                if unit.congested:
-                    num_congested_hs += 1
-                    hs_congestion[unit.id] = calc_unserviced_traffic_demand(unit)
-                sum_desired_hs += unit.traffic_demand / 2
-                sum_allocated_hs += min(unit.traffic_demand / 2, unit.bandwidth)
-
-            elif unit.unit_type == UnitType.BS:
-                if unit.congested:
-                    num_congested_bs += 1
-                    bs_congestion[unit.id] = calc_unserviced_traffic_demand(unit)
-                sum_desired_bs += unit.traffic_demand / 2
-                sum_allocated_bs += min(unit.traffic_demand / 2, unit.bandwidth)
-        
-        congested_bs = 100 * num_congested_bs / total_num_bs
-        congested_hs = 100 * num_congested_hs / total_num_hs
+def sum_columns(units, key, num_keys, fields):
+    """Sums each of the given AGGREGATE_COLUMNS per key (one per unit), one bincount per column: shape (num_keys, len(fields))."""
+    sums = [np.bincount(key, weights=AGGREGATE_COLUMNS[field](units), minlength=num_keys) for field in fields]
+    return np.stack(sums, axis=-1)
 
-        f.write(f"Percentage of congested Hotspots: {congested_hs:.3f}%\n")
-        f.write(f"Percentage of congested Base Stations: {congested_bs:.3f}%\n")
+def aggregate_units(units, fields=AGGREGATE_FIELDS):
+    """
+    Sums the given AGGREGATE_COLUMNS over the units by density and unit type.
+    Returns an array of shape (3, len(UnitType), len(fields)), indexed by
+    [density, unit_type.value, field].
+    """
+    num_types = len(UnitType)
+    key = units.density.astype(np.intp) * num_types + units.unit_type
+    return sum_columns(units, key, 3 * num_types, fields).reshape(3, num_types, len(fields))
 
-        total_unserviced_traffic_demand_hs = 0
-        for unit_id in hs_congestion:
-            total_unserviced_traffic_demand_hs += hs_congestion[unit_id]
+class BlockStats:
+    """
+    Per-block totals of the BLOCK_FIELDS columns over one year, indexed by
+    [block row, block col, snapshot, unit type value, field]. add() updates them
+    with one bincount per field; flush() writes the year to
+    <path>/year_<year>.npz as one (rows, cols, 6, 2) array per field, plus the
+    unit count of every block and its population density, and starts over.
+    """
+    FIELDS = ("congested", "demand", "unserviced")
+
+    def __init__(self, path, units, population_density, block_size):
+        self.path = path
+        self.population_density = population_density
+        rows, cols = population_density.shape
+        num_types = len(UnitType)
+        block = (units.position[:, 1] // block_size).astype(np.intp) * cols + units.position[:, 0] // block_size
+        self.key = block * num_types + units.unit_type
+        self.num_keys = rows * cols * num_types
+        self.units = np.bincount(self.key, minlength=self.num_keys).reshape(rows, cols, num_types)
+        self.totals = np.zeros((rows, cols, 6, num_types, len(self.FIELDS)))
+
+    def add(self, units, snapshot):
+        sums = sum_columns(units, self.key, self.num_keys, self.FIELDS)
+        self.totals[:, :, snapshot] += sums.reshape(self.units.shape + (len(self.FIELDS),))
+
+    def flush(self, year, num_days):
+        """Writes the year's totals (summed over num_days days) and resets them; returns the file path."""
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f"year_{year}.npz")
+        np.savez(path, num_days=num_days, units=self.units, density=self.population_density,
+                 **{field: self.totals[..., i] for i, field in enumerate(self.FIELDS)})
+        self.totals[:] = 0
+        return path
+
+def aggregate_rows(year, table):
+    """One tidy row per (snapshot, density, unit type) of a year's (6, 3, 2, fields) aggregate table."""
+    rows = []
+    for snapshot, density, unit_type in np.ndindex(table.shape[:3]):
+        row = {"year": year, "snapshot": snapshot, "density": density, "unit_type": UnitType(unit_type).name}
+        for field, value in zip(AGGREGATE_FIELDS, table[snapshot, density, unit_type].tolist()):
+            row[field] = int(value) if field in ("units", "congested", "demand") else value
+        rows.append(row)
+    return rows
+    
+
+def plot_day1_snapshots(daily_snapshot_stats, num_years, output_dir="outputs"):
+    """Congestion and spectrum allocation per snapshot on the first simulated day."""
+    import matplotlib.pyplot as plt
+
+    os.makedirs(output_dir, exist_ok=True)
+    # --- Intra-Day Congestion and Allocation Plots for Day 1 --- #
+    # for metric in ["hs_congestion", "bs_congestion", "hs_bandwidth", "bs_bandwidth"]:
+    #     plt.figure(figsize=(8, 5))
+    #     values_for_day1 = [daily_snapshot_stats[metric][snapshot][0] for snapshot in range(6)]
+    #     plt.plot(range(1, 7), values_for_day1, marker="o")
+    #     plt.xlabel("Snapshot")
+    #     ylabel = "% Congestion" if "congestion" in metric else "Total Spectrum Allocated (MHz)"
+    #     plt.ylabel(ylabel)
+    #     title = f"{'Wi-Fi' if 'hs' in metric else 'Cellular'} {'Congestion' if 'congestion' in metric else 'Spectrum'} - Day 1"
+    #     plt.title(title)
+    #     plt.grid(True)
+    #     plt.savefig(f"{output_dir}/{num_years}_{metric}_snapshot_day1_plot.png")
+    #     plt.close()
+    snapshots = range(6)
+    # === Plot 1: Congestion (Grouped bar chart) ===
+    hs_congestion = [daily_snapshot_stats["hs_congestion"][snap][0] for snap in snapshots]
+    bs_congestion = [daily_snapshot_stats["bs_congestion"][snap][0] for snap in snapshots]
+
+    bar_width = 0.35
+    x = np.arange(len(snapshots))
+
+    plt.figure(figsize=(10, 5))
+    plt.bar(x - bar_width/2, hs_congestion, width=bar_width, label='Wi-Fi (HS)', color='skyblue')
+    plt.bar(x + bar_width/2, bs_congestion, width=bar_width, label='Cellular (BS)', color='salmon')
+    plt.xlabel("Snapshot")
+    plt.ylabel("% Congestion")
+    plt.title("Congestion Comparison (Wi-Fi vs Cellular) - Day 1")
+    plt.xticks(x, [f"{i+1}" for i in snapshots])
+    plt.legend()
+    plt.grid(True, axis='y')
+    plt.tight_layout()
+    # plt.savefig(f"{output_dir}/{num_years}_congestion_comparison_day1_bar.png")
+    plt.close()
 
-        total_unserviced_traffic_demand_bs = 0
-        for unit_id in bs_congestion:
-            total_unserviced_traffic_demand_bs += bs_congestion[unit_id]
+    # === Plot 2: Spectrum Allocation (Stacked bar chart) ===
+    hs_bandwidth = [daily_snapshot_stats["hs_bandwidth"][snap][0] for snap in snapshots]
+    bs_bandwidth = [daily_snapshot_stats["bs_bandwidth"][snap][0] for snap in snapshots]
+
+    plt.figure(figsize=(10, 5))
+    plt.bar(x, hs_bandwidth, label='Wi-Fi (HS)', color='skyblue')
+    plt.bar(x, bs_bandwidth, bottom=hs_bandwidth, label='Cellular (BS)', color='salmon')
+    plt.xlabel("Snapshot")
+    plt.ylabel("Total Spectrum Allocated (MHz)")
+    plt.title("Spectrum Allocation (Wi-Fi + Cellular) - Day 1")
+    plt.xticks(x, [f"{i+1}" for i in snapshots])
+    plt.legend()
+    plt.grid(True, axis='y')
+    plt.tight_layout()
+    plt.savefig(f"{output_dir}/{num_years}_bandwidth_comparison_day1_bar.png")
+    plt.close()
 
-        avg_unserviced_traffic_demand_hs = total_unserviced_traffic_demand_hs / total_num_hs
-        avg_unserviced_traffic_demand_bs = total_unserviced_traffic_demand_bs / total_num_bs
+def plot_yearly_stats(yearly_stats, num_years, output_dir="outputs"):
+    """City-wide congestion and demand met over the years."""
+    import matplotlib.pyplot as plt
 
-        percent_traffic_demand_met_hs = (sum_allocated_hs / sum_desired_hs)*100
-        percent_traffic_demand_met_bs = (sum_allocated_bs / sum_desired_bs)*100
+    os.makedirs(output_dir, exist_ok=True)
+    years = list(range(1, num_years + 1))
 
-        f.write(f"\nTotal Unserviced Traffic Demand (Mbps) for Hotspots: {total_unserviced_traffic_demand_hs:.3f}")
-        f.write(f"\nAvg Unserviced Traffic Demand (Mbps) per Hotspot: {avg_unserviced_traffic_demand_hs:.3f}")
-        f.write(f"\nPercentage of Total Wifi Traffic Demand Met: {percent_traffic_demand_met_hs:.3f}%\n")
+    # --- Over all (Over years) ---#
 
-        # for unit_id in hs_congestion:
-        #     x, y = db.database[unit_id].position
-        #     f.write(f"Unit {unit_id} Pos {(x, y)}: {hs_congestion[unit_id]}\n")
-        
-        f.write(f"\nTotal Unserviced Traffic Demand (Mbps) for Base Stations: {total_unserviced_traffic_demand_bs:.3f}")
-        f.write(f"\nAvg Unserviced Traffic Demand (Mbps) per Base Station: {avg_unserviced_traffic_demand_bs:.3f}")
-        f.write(f"\nPercentage of Total Cellular Traffic Demand Met: {percent_traffic_demand_met_bs:.3f}%\n")
-
-        # for unit_id in bs_congestion:
-        #     x, y = db.database[unit_id].position
-        #     f.write(f"Unit {unit_id} Pos {(x, y)}: {bs_congestion[unit_id]}\n")
-
-        f.write(f"\n=============================================================================\n")
-        f.write(f"=============================================================================\n")
-        f.write(f"=============================================================================\n")
-
-        yearly_stats["congested_hs_percent"].append(congested_hs)
-        yearly_stats["congested_bs_percent"].append(congested_bs)
-        yearly_stats["percent_traffic_demand_met_hs"].append(percent_traffic_demand_met_hs)
-        yearly_stats["percent_traffic_demand_met_bs"].append(percent_traffic_demand_met_bs)
-
-        if year == 0:
-            # --- Intra-Day Congestion and Allocation Plots for Day 1 --- #
-            # for metric in ["hs_congestion", "bs_congestion", "hs_bandwidth", "bs_bandwidth"]:
-            #     plt.figure(figsize=(8, 5))
-            #     values_for_day1 = [daily_snapshot_stats[metric][snapshot][0] for snapshot in range(6)]
-            #     plt.plot(range(1, 7), values_for_day1, marker="o")
-            #     plt.xlabel("Snapshot")
-            #     ylabel = "% Congestion" if "congestion" in metric else "Total Spectrum Allocated (MHz)"
-            #     plt.ylabel(ylabel)
-            #     title = f"{'Wi-Fi' if 'hs' in metric else 'Cellular'} {'Congestion' if 'congestion' in metric else 'Spectrum'} - Day 1"
-            #     plt.title(title)
-            #     plt.grid(True)
-            #     plt.savefig(f"outputs/{NUM_YEARS}_{metric}_snapshot_day1_plot.png")
-            #     plt.close()
-            snapshots = range(6)
-            # === Plot 1: Congestion (Grouped bar chart) ===
-            hs_congestion = [daily_snapshot_stats["hs_congestion"][snap][0] for snap in snapshots]
-            bs_congestion = [daily_snapshot_stats["bs_congestion"][snap][0] for snap in snapshots]
-
-            bar_width = 0.35
-            x = np.arange(len(snapshots))
-
-            plt.figure(figsize=(10, 5))
-            plt.bar(x - bar_width/2, hs_congestion, width=bar_width, label='Wi-Fi (HS)', color='skyblue')
-            plt.bar(x + bar_width/2, bs_congestion, width=bar_width, label='Cellular (BS)', color='salmon')
-            plt.xlabel("Snapshot")
-            plt.ylabel("% Congestion")
-            plt.title("Congestion Comparison (Wi-Fi vs Cellular) - Day 1")
-            plt.xticks(x, [f"{i+1}" for i in snapshots])
-            plt.legend()
-            plt.grid(True, axis='y')
-            plt.tight_layout()
-            # plt.savefig(f"outputs/{NUM_YEARS}_congestion_comparison_day1_bar.png")
-            plt.close()
-
-            # === Plot 2: Spectrum Allocation (Stacked bar chart) ===
-            hs_bandwidth = [daily_snapshot_stats["hs_bandwidth"][snap][0] for snap in snapshots]
-            bs_bandwidth = [daily_snapshot_stats["bs_bandwidth"][snap][0] for snap in snapshots]
-
-            plt.figure(figsize=(10, 5))
-            plt.bar(x, hs_bandwidth, label='Wi-Fi (HS)', color='skyblue')
-            plt.bar(x, bs_bandwidth, bottom=hs_bandwidth, label='Cellular (BS)', color='salmon')
-            plt.xlabel("Snapshot")
-            plt.ylabel("Total Spectrum Allocated (MHz)")
-            plt.title("Spectrum Allocation (Wi-Fi + Cellular) - Day 1")
-            plt.xticks(x, [f"{i+1}" for i in snapshots])
-            plt.legend()
-            plt.grid(True, axis='y')
-            plt.tight_layout()
-            plt.savefig(f"outputs/{NUM_YEARS}_bandwidth_comparison_day1_bar.png")
-            plt.close()
-
-        if year == NUM_YEARS - 1:
-            os.makedirs("outputs", exist_ok=True)
-            years = list(range(1, NUM_YEARS + 1))
-
-            # --- Over all (Over years) ---#
-
-            # Plot 1: Hotspot Congestion Over Time
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, yearly_stats["congested_hs_percent"], color="royalblue", marker="o")
-            plt.xlabel("Year")
-            plt.ylabel("HS Congestion (%)")
-            plt.title("Hotspot Congestion Over Time")
-            plt.grid(True)
-            plt.savefig(f"outputs/{NUM_YEARS}_hs_congestion_plot.png")
-            plt.close()
-
-            # Plot 2: Base Station Congestion Over Time
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, yearly_stats["congested_bs_percent"], color="firebrick", marker="o")
-            plt.xlabel("Year")
-            plt.ylabel("BS Congestion (%)")
-            plt.title("Base Station Congestion Over Time")
-            plt.grid(True)
-            plt.savefig(f"outputs/{NUM_YEARS}_bs_congestion_plot.png")
-            plt.close()
-
-            # Plot 3: Wi-Fi Traffic Demand Met
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, yearly_stats["percent_traffic_demand_met_hs"], color="seagreen", marker="o")
-            plt.xlabel("Year")
-            plt.ylabel("Wi-Fi Traffic Demand Met (%)")
-            plt.title("Wi-Fi Traffic Demand Satisfaction Over Time")
-            plt.grid(True)
-            plt.savefig(f"outputs/{NUM_YEARS}_wifi_demand_met_plot.png")
-            plt.close()
-
-            # Plot 4: Cellular Traffic Demand Met
-            plt.figure(figsize=(8, 5))
-            plt.plot(years, yearly_stats["percent_traffic_demand_met_bs"], color="goldenrod", marker="o")
-            plt.xlabel("Year")
-            plt.ylabel("Cellular Traffic Demand Met (%)")
-            plt.title("Cellular Traffic Demand Satisfaction Over Time")
-            plt.grid(True)
-            plt.savefig(f"outputs/{NUM_YEARS}_cellular_demand_met_plot.png")
-            plt.close()
-
-
-def plot_yearly_congestion(congestion_dict, label_prefix):
-    x_vals = list(range(1, NUM_YEARS + 1))
+    # Plot 1: Hotspot Congestion Over Time
+    plt.figure(figsize=(8, 5))
+    plt.plot(years, yearly_stats["congested_hs_percent"], color="royalblue", marker="o")
+    plt.xlabel("Year")
+    plt.ylabel("HS Congestion (%)")
+    plt.title("Hotspot Congestion Over Time")
+    plt.grid(True)
+    plt.savefig(f"{output_dir}/{num_years}_hs_congestion_plot.png")
+    plt.close()
+
+    # Plot 2: Base Station Congestion Over Time
+    plt.figure(figsize=(8, 5))
+    plt.plot(years, yearly_stats["congested_bs_percent"], color="firebrick", marker="o")
+    plt.xlabel("Year")
+    plt.ylabel("BS Congestion (%)")
+    plt.title("Base Station Congestion Over Time")
+    plt.grid(True)
+    plt.savefig(f"{output_dir}/{num_years}_bs_congestion_plot.png")
+    plt.close()
+
+    # Plot 3: Wi-Fi Traffic Demand Met
+    plt.figure(figsize=(8, 5))
+    plt.plot(years, yearly_stats["percent_traffic_demand_met_hs"], color="seagreen", marker="o")
+    plt.xlabel("Year")
+    plt.ylabel("Wi-Fi Traffic Demand Met (%)")
+    plt.title("Wi-Fi Traffic Demand Satisfaction Over Time")
+    plt.grid(True)
+    plt.savefig(f"{output_dir}/{num_years}_wifi_demand_met_plot.png")
+    plt.close()
+
+    # Plot 4: Cellular Traffic Demand Met
+    plt.figure(figsize=(8, 5))
+    plt.plot(years, yearly_stats["percent_traffic_demand_met_bs"], color="goldenrod", marker="o")
+    plt.xlabel("Year")
+    plt.ylabel("Cellular Traffic Demand Met (%)")
+    plt.title("Cellular Traffic Demand Satisfaction Over Time")
+    plt.grid(True)
+    plt.savefig(f"{output_dir}/{num_years}_cellular_demand_met_plot.png")
+    plt.close()
+
+def plot_yearly_congestion(congestion_dict, label_prefix, num_years, output_dir="outputs"):
+    import matplotlib.pyplot as plt
+
+    x_vals = list(range(1, num_years + 1))
     plt.figure(figsize=(8, 5))
     for d in [0, 1, 2]:
         yearly_congestion = congestion_dict.get(d, [])
@@ -729,10 +1447,14 @@ def plot_yearly_congestion(congestion_dict, label_prefix):
     plt.title(f"{label_prefix} Congestion Over Time by Geographic Density")
     plt.legend()
     plt.grid(True)
-    plt.savefig(f"outputs/{NUM_YEARS}_{label_prefix.lower()}_density_congestion.png")
+    os.makedirs(output_dir, exist_ok=True)
+    plt.savefig(f"{output_dir}/{num_years}_{label_prefix.lower()}_density_congestion.png")
     plt.close()
 
-def plot_congestion_heatmap(congestion_dict, label_prefix):
+def plot_congestion_heatmap(congestion_dict, label_prefix, num_years, output_dir="outputs"):
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+
     # Prepare data as 2D array: rows = density, cols = years
     data = []
     for d in [0, 1, 2]:
@@ -748,16 +1470,25 @@ def plot_congestion_heatmap(congestion_dict, label_prefix):
     plt.xlabel("Year")
     plt.ylabel("Geographic Density")
     plt.tight_layout()
-    plt.savefig(f"outputs/{NUM_YEARS}_{label_prefix.lower()}_congestion_heatmap.png")
+    os.makedirs(output_dir, exist_ok=True)
+    plt.savefig(f"{output_dir}/{num_years}_{label_prefix.lower()}_congestion_heatmap.png")
     plt.close()
 
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import numpy as np
-import os
+def animate_congestion(history, positions, unit_types, unit_type_to_plot, filename, city_size, population_density,
+                       output_dir="outputs", frames="year", fps=None):
+    """
+    GIF of the congested units of one type over the recorded history, drawn on
+    top of the population density map. frames is "year" (the last recorded
+    frame of every year) or "all" (every recorded frame, i.e. every snapshot
+    with HISTORY_INTERVAL = "snapshot"). Each frame reads one row of the
+    (frames x units) congested history and only moves the offsets of a single
+    scatter; the animated artists are blitted.
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+    from matplotlib.colors import ListedColormap
 
-# Function to animate congestion and show unit movement over time
-def animate_congestion(db_snapshots, unit_type_to_plot, filename, city_size, population_density):
+    assert frames in ("year", "all"), f"[animate_congestion]: Unknown frames {frames}."
     fig, ax = plt.subplots(figsize=(10, 10))
 
     # Background population density
@@ -770,154 +1501,618 @@ def animate_congestion(db_snapshots, unit_type_to_plot, filename, city_size, pop
     ax.set_xlabel("X")
     ax.set_ylabel("Y")
 
-    # Get all unit positions of the relevant type from the first snapshot
-    first_snapshot = db_snapshots[0]
-    all_units_of_type = {
-        unit.id: unit.position
-        for unit in first_snapshot.values()
-        if unit.unit_type == unit_type_to_plot
-    }
-
-    unit_ids = list(all_units_of_type.keys())
-    all_x = [pos[0] for pos in all_units_of_type.values()]
-    all_y = [pos[1] for pos in all_units_of_type.values()]
+    # Positions of all units of the relevant type
+    unit_ids = np.flatnonzero(unit_types == unit_type_to_plot.value)
+    positions = positions[unit_ids]
 
     # Static scatter for all units in black
-    ax.scatter(all_x, all_y, s=10, c='black', label='Unit')
+    ax.scatter(positions[:, 0], positions[:, 1], s=10, c='black', label='Unit')
 
     # Animated scatter for congested units in red
-    scatter_congested = ax.scatter([], [], s=10, c='red', label='Congested')
-    ax.legend()
+    scatter_congested = ax.scatter(np.empty(0), np.empty(0), s=10, c='red', label='Congested', animated=True)
+    label = ax.text(0.02, 0.98, "", transform=ax.transAxes, va="top", animated=True,
+                    bbox=dict(facecolor="white", alpha=0.8))
+    ax.legend(loc="upper right")
+
+    frame_numbers = history.year_end_frames() if frames == "year" else np.arange(history.count)
+    congested = history.frames("congested")
+    index = history.frame_index()
+
+    def init():
+        scatter_congested.set_offsets(np.empty((0, 2)))
+        label.set_text("")
+        return scatter_congested, label
+
+    def update(i):
+        frame = frame_numbers[i]
+        scatter_congested.set_offsets(positions[congested[frame, unit_ids]])
+        year, day, snapshot = index[frame].tolist()
+        label.set_text(f"Year {year + 1}" if frames == "year" else f"Year {year + 1}, Day {day + 1}, Snapshot {snapshot + 1}")
+        return scatter_congested, label
+
+    ani = animation.FuncAnimation(fig, update, frames=len(frame_numbers), init_func=init, blit=True, repeat=False)
+    os.makedirs(output_dir, exist_ok=True)
+    ani.save(f"{output_dir}/{filename}.gif", writer="pillow", fps=fps or (1 if frames == "year" else 6))
+    plt.close(fig)
 
-    def update(frame):
-        units = db_snapshots[frame]
-        x_cong, y_cong = [], []
+"""
+STEP 7: Simulation
+"""
+# Independent random streams of a run, in spawn order
+RNG_STREAMS = ("density", "placement", "demand", "requests")
 
-        for uid in unit_ids:
-            unit = units.get(uid)
-            if unit and unit.congested:
-                x, y = unit.position
-                x_cong.append(x)
-                y_cong.append(y)
+def make_streams(seed, replica=0):
+    """
+    Returns one numpy Generator per name in RNG_STREAMS. They are spawned from
+    child `replica` of SeedSequence(seed), so every stream of every replica is
+    independent and the same (seed, replica) always gives the same draws.
+    """
+    replica_sequence = np.random.SeedSequence(seed, spawn_key=(replica,))
+    children = replica_sequence.spawn(len(RNG_STREAMS))
+    return {name: np.random.default_rng(child) for name, child in zip(RNG_STREAMS, children)}
 
-        scatter_congested.set_offsets(np.column_stack((x_cong, y_cong)))
-        ax.set_title(f"{unit_type_to_plot.name} Congestion - Year {frame + 1}")
+def default_stream(name):
+    """The named stream of config.SEED / config.REPLICA, for components built outside a Simulation."""
+    return make_streams(config.SEED, config.REPLICA)[name]
 
-    ani = animation.FuncAnimation(fig, update, frames=len(db_snapshots), repeat=False)
-    ani.save(f"outputs/{filename}.gif", writer="pillow", fps=1)
-    plt.close()
+def encode_state(value):
+    """
+    JSON-safe copy of value. Tuples and dicts with non-string keys are tagged so
+    that decode_state can rebuild them; numpy scalars become Python numbers.
+    """
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode_state(item) for key, item in value.items()}
+        return {"__items__": [[encode_state(key), encode_state(item)] for key, item in value.items()]}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_state(item) for item in value]}
+    if isinstance(value, list):
+        return [encode_state(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def decode_state(value):
+    if isinstance(value, dict):
+        if "__tuple__" in value:
+            return tuple(decode_state(item) for item in value["__tuple__"])
+        if "__items__" in value:
+            return {decode_state(key): decode_state(item) for key, item in value["__items__"]}
+        return {key: decode_state(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_state(item) for item in value]
+    return value
+
+def place_city(cfg, units, streams):
+    """
+    Draws the population density map of cfg's city and places its units into
+    units; returns the map. Only the city settings and the "density" and
+    "placement" streams are used, so every MODE, split and D_w / D_c of a
+    (SEED, REPLICA) gets the same city.
+    """
+    #simulating a pop density: 0 = Low, 1 = Medium, 2 = High
+    population_density = streams["density"].choice([0, 1, 2], size=tuple(cfg.CITY_SIZE), p=[0.3, 0.4, 0.3])
+    place_units(units, population_density, cfg.BLOCK_SIZE,
+                cfg.N_HS_PER_DENSITY, cfg.N_BS_PER_DENSITY, streams["placement"])
+    return population_density
 
-"""
-STEP 7: Simulation loop 
-"""
-def simulate_dynamic_allocation(demand_growth_rate):
-    for year in range(NUM_YEARS):
-        print(f"\nStarting Year {year + 1}...\n")
-        yearly_density_congestion_hs = {0: 0, 1: 0, 2: 0}
-        yearly_density_congestion_bs = {0: 0, 1: 0, 2: 0}
-        hs_total = {0: 0, 1: 0, 2: 0}
-        bs_total = {0: 0, 1: 0, 2: 0}
-
-        for day in range(NUM_DAYS):
-            print(f"\n  Starting Day {day + 1}...\n")
-
-            for unit in db.database.values():
-                unit.bandwidth = 0
-                unit.congested = False
-
-            for snapshot in range(6):
-                print(f"    Snapshot {snapshot + 1}:")
-
-                # Clear congestion tracking
-                hs_congested = 0
-                bs_congested = 0
-
-                for unit in db.database.values():
-                    unit.update_traffic_demand(snapshot, demand_growth_rate, traffic_demand_bounds)            
-                    unit.make_request(db.request_queue)
-                    level = unit.density
-                    if unit.unit_type == UnitType.HS:
-                        hs_total[level] += 1
-                        if unit.congested:
-                            hs_congested += 1
-                            yearly_density_congestion_hs[level] += 1
- 
-                    elif unit.unit_type == UnitType.BS:
-                        bs_total[level] += 1
-                        if unit.congested:
-                            bs_congested += 1
-                            yearly_density_congestion_bs[level] += 1
-                
-                total_hs_requested = sum(unit.traffic_demand for unit in db.database.values() if unit.unit_type == UnitType.HS)
-                total_bs_requested = sum(unit.traffic_demand for unit in db.database.values() if unit.unit_type == UnitType.BS)
-                print("Avg HS demand:", total_hs_requested / total_num_hs)
-                print("Avg BS demand:", total_bs_requested / total_num_bs)
-
-                # ---- Diagnostic Logging ----
-                hotspot_units = [unit for unit in db.database.values() if unit.unit_type == UnitType.HS]
-                base_station_units = [unit for unit in db.database.values() if unit.unit_type == UnitType.BS]
-
-                total_wifi_demand = sum(unit.traffic_demand for unit in hotspot_units)
-                total_cellular_demand = sum(unit.traffic_demand for unit in base_station_units)
-
-                hotspot_group_sizes = [len(group) for group in group_units(hotspot_units, config.D_w)]
-                base_station_group_sizes = [len(group) for group in group_units(base_station_units, config.D_c)]
-
-                print(f"\n---- Time Step Diagnostic (Wi-Fi Fraction = {(db.wifi_freq_range[1] - db.wifi_freq_range[0]):.2f}) ----")
-                print(f"Total Wi-Fi Demand: {total_wifi_demand:.2f} Mbps")
-                print(f"Total Cellular Demand: {total_cellular_demand:.2f} Mbps")
-                print(f"Avg Demand per Hotspot: {total_wifi_demand / len(hotspot_units):.2f} Mbps")
-                print(f"Avg Demand per Base Station: {total_cellular_demand / len(base_station_units):.2f} Mbps")
-
-                print(f"Number of Wi-Fi Groups: {len(hotspot_group_sizes)}")
-                print(f"Average Hotspot Group Size: {sum(hotspot_group_sizes)/len(hotspot_group_sizes):.2f}")
-                print(f"Number of Cellular Groups: {len(base_station_group_sizes)}")
-                print(f"Average Base Station Group Size: {sum(base_station_group_sizes)/len(base_station_group_sizes):.2f}")
-
-                while not db.request_queue.empty():  
-                    request = db.request_queue.get()  
-                    unit_id, bandwidth = request 
-                    unit = db.database[unit_id]
-
-                    allocate_spectrum(unit, bandwidth)
-
-                db.update_ratios(snapshot)
-
-                daily_snapshot_stats["hs_congestion"][snapshot].append(hs_congested / total_num_hs * 100)
-                daily_snapshot_stats["bs_congestion"][snapshot].append(bs_congested / total_num_bs * 100)
-                daily_snapshot_stats["hs_bandwidth"][snapshot].append(db.cellular_freq_range[1] - db.cellular_freq_range[0])
-                daily_snapshot_stats["bs_bandwidth"][snapshot].append(db.wifi_freq_range[1] - db.wifi_freq_range[0])
-            
-        db_snapshots.append(copy.deepcopy(db.database))
+def make_config(base=None, **overrides):
+    """Returns a copy of the config module's settings (or of base) with overrides applied."""
+    base = config if base is None else base
+    values = {key: value for key, value in vars(base).items() if not key.startswith("_")}
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class Simulation:
+    """
+    One independent simulated city: its units, interference groups and stats.
+    Nothing is built or written when this module is imported; construct a
+    Simulation and call simulate_dynamic_allocation() to run it.
+
+        sim = Simulation(config, MODE="Static_Range", SEED=7)
+
+    groups=(group_id, adjacency) hands in interference groups built elsewhere
+    for this city at its D_w / D_c (e.g. by GroupSweep.groups, which searches
+    the pairs of one city once for many distances) instead of building them.
+    """
+    def __init__(self, cfg=None, groups=None, **overrides):
+        cfg = make_config(cfg, **overrides)
+        self._init_run(cfg)
+
+        """
+        STEP 1: Create dat "map"!
+
+        TODO: [Swati] - change population_density acc to time of day 
+        Assign areas: Business, Residential, Shopping(Lunch)
+        """
+        # STEP 2: Placing BS and HS (on the map of STEP 1, which place_city draws first)
+        self.db = Database(cfg.MODE, cfg.spectrum_split)
+        self.population_density = place_city(cfg, self.db.units, self.streams)
+        self.demand_generator = DemandGenerator(cfg.traffic_demand_bounds, self.streams["demand"])
+
+        self.total_num_hs = self.db.units.count(UnitType.HS)
+        self.total_num_bs = self.db.units.count(UnitType.BS)
+        if cfg.BLOCK_STATS:
+            self.block_stats = BlockStats(os.path.join(self.output_dir, "blocks"), self.db.units,
+                                          self.population_density, self.block_size)
+
+        # STEP 3: Process all units and assign groups
+        self._build_groups(groups)
+
+    def _init_run(self, cfg):
+        """Settings and empty stats of a run that hasn't started yet."""
+        self.config = cfg
+        # every random draw of the run comes from one of these (seeded by SEED and REPLICA)
+        self.streams = make_streams(cfg.SEED, cfg.REPLICA)
+        self.num_years = cfg.NUM_YEARS
+        self.num_days = cfg.NUM_DAYS
+        self.D_w = cfg.D_w
+        self.D_c = cfg.D_c
+        self.output_dir = cfg.OUTPUT_DIR
+        self.report_file_path = cfg.REPORT_FILE
+        self.demand_growth_rate = 1.0
+
+        self.history_interval = cfg.HISTORY_INTERVAL
+        self.assign_channels = cfg.ASSIGN_CHANNELS
+        self.request_scheduler = None
+        if cfg.REQUEST_TICK_HOURS is not None:
+            self.request_scheduler = RequestScheduler(cfg.REQUEST_TICK_HOURS, cfg.REQUEST_MAX_RETRIES,
+                                                      cfg.REQUEST_TTL_HOURS, self.streams["requests"])
+        self.yearly_stats = {
+            "congested_hs_percent": [],
+            "congested_bs_percent": [],
+            "percent_traffic_demand_met_hs": [],
+            "percent_traffic_demand_met_bs": []
+        }
+        self.yearly_congestion_hs = {0: [], 1: [], 2: []}
+        self.yearly_congestion_bs = {0: [], 1: [], 2: []}
+        self.daily_snapshot_stats = defaultdict(lambda: [[] for _ in range(6)])
+
+        # next (year, day) to simulate and the aggregates of the current year
+        self.year = 0
+        self.day = 0
+        self.year_table = None
+        self.block_stats = None
+        self.checkpoint_interval = cfg.CHECKPOINT_INTERVAL
+
+        self.city_size = tuple(cfg.CITY_SIZE)
+        self.block_size = cfg.BLOCK_SIZE
+        # setting the number of hs and bs per block acc to density
+        self.hs_per_density = cfg.N_HS_PER_DENSITY
+        self.bs_per_density = cfg.N_BS_PER_DENSITY
+
+        self.history = None
+        self.writer = None
+        self.timer = profiling.PhaseTimer(cfg.PROFILE, cfg.PROFILE_SNAPSHOT,
+                                          os.path.join(self.output_dir, "profile"))
+
+    def _build_groups(self, groups=None):
+        """Builds the interference graph, labels the groups and sums their committed bandwidth."""
+        cfg = self.config
+        if groups is not None:
+            self.db.units.group_id, self.adjacency = groups
+            self.group_freq = sum_group_frequencies(self.db.units)
+        else:
+            if cfg.TILE_SIZE is None:
+                self.adjacency = assign_group(self.db.units, self.D_w, self.D_c)
+            else:
+                import tiling
+                tiled_city = tiling.TiledCity(self.db.units, cfg.TILE_SIZE, max(self.D_w, self.D_c), cfg.TILE_WORKERS)
+                self.adjacency = tiled_city.assign_group(self.D_w, self.D_c)
 
+            # group_id -> committed bandwidth (MHz), updated in place by allocate_spectrum
+            self.group_freq = find_groups_and_sum_frequencies(self.db.units, self.adjacency)
 
-        for d in [0, 1, 2]:
-            hs_ratio = 100 * yearly_density_congestion_hs[d] / max(1, hs_total[d])
-            bs_ratio = 100 * yearly_density_congestion_bs[d] / max(1, bs_total[d])
-            # print(f"[DEBUG] Appending to congestion stats — Year {year}, Density {d}, BS Ratio = {bs_ratio}")
-            # print(f"[DEBUG] yearly_density_congestion_bs[{d}] = {yearly_density_congestion_bs[d]}, bs_total[{d}] = {bs_total[d]}")
-            yearly_congestion_hs[d].append(hs_ratio)
-            yearly_congestion_bs[d].append(bs_ratio)
+    def open_history(self, resume_from=None, resume_count=0):
+        """
+        Preallocates the history files for a full run at HISTORY_INTERVAL. When
+        resuming, the first resume_count frames of the history at resume_from
+        are carried over (in place if it is this run's own history).
+        """
+        frames_per_year = {"snapshot": self.num_days * 6, "day": self.num_days, "year": 1}[self.history_interval]
+        path = os.path.join(self.output_dir, "history")
+        num_frames = self.num_years * frames_per_year
+
+        if resume_from is not None and os.path.abspath(resume_from) == os.path.abspath(path):
+            source = HistoryStore.open(path)
+            assert source.num_frames == num_frames, \
+                f"[Simulation][open_history]: Can't resize the history at {path} in place; resume into another OUTPUT_DIR."
+            self.history = HistoryStore(path, len(self.db.units), num_frames, mode="r+")
+            self.history.truncate(resume_count)
+            return
+
+        self.history = HistoryStore(path, len(self.db.units), num_frames)
+        if resume_from is not None:
+            self.history.extend(HistoryStore.open(resume_from), resume_count)
+
+    def record_history(self, year, day, snapshot):
+        if self.history_interval == "snapshot" \
+                or (self.history_interval == "day" and snapshot == 5) \
+                or (self.history_interval == "year" and snapshot == 5 and day == self.num_days - 1):
+            self.history.append(year, day, snapshot, self.db.units)
+
+    def generate_report(self, year):
+        db = self.db
+        total_num_hs, total_num_bs = self.total_num_hs, self.total_num_bs
+        yearly_stats = self.yearly_stats
+
+        with io.StringIO() as f:
+            f.write(f"\n\n\n=============================================================================\n")
+            f.write(f"================================== Year {year} ==================================\n")
+            f.write(f"=============================================================================\n")
+
+            # end-of-year state of every unit, summed per unit type
+            by_type = aggregate_units(db.units, ("congested", "demand", "met", "unserviced")).sum(axis=0)
+            num_congested_hs, sum_demand_hs, sum_allocated_hs, total_unserviced_traffic_demand_hs = by_type[UnitType.HS.value].tolist()
+            num_congested_bs, sum_demand_bs, sum_allocated_bs, total_unserviced_traffic_demand_bs = by_type[UnitType.BS.value].tolist()
+            sum_desired_hs, sum_desired_bs = sum_demand_hs / 2, sum_demand_bs / 2
+
+            congested_bs = 100 * num_congested_bs / total_num_bs
+            congested_hs = 100 * num_congested_hs / total_num_hs
+
+            f.write(f"Percentage of congested Hotspots: {congested_hs:.3f}%\n")
+            f.write(f"Percentage of congested Base Stations: {congested_bs:.3f}%\n")
+
+            avg_unserviced_traffic_demand_hs = total_unserviced_traffic_demand_hs / total_num_hs
+            avg_unserviced_traffic_demand_bs = total_unserviced_traffic_demand_bs / total_num_bs
+
+            percent_traffic_demand_met_hs = (sum_allocated_hs / sum_desired_hs)*100
+            percent_traffic_demand_met_bs = (sum_allocated_bs / sum_desired_bs)*100
+
+            f.write(f"\nTotal Unserviced Traffic Demand (Mbps) for Hotspots: {total_unserviced_traffic_demand_hs:.3f}")
+            f.write(f"\nAvg Unserviced Traffic Demand (Mbps) per Hotspot: {avg_unserviced_traffic_demand_hs:.3f}")
+            f.write(f"\nPercentage of Total Wifi Traffic Demand Met: {percent_traffic_demand_met_hs:.3f}%\n")
+
+            # for unit_id in hs_congestion:
+            #     x, y = db.database[unit_id].position
+            #     f.write(f"Unit {unit_id} Pos {(x, y)}: {hs_congestion[unit_id]}\n")
+        
+            f.write(f"\nTotal Unserviced Traffic Demand (Mbps) for Base Stations: {total_unserviced_traffic_demand_bs:.3f}")
+            f.write(f"\nAvg Unserviced Traffic Demand (Mbps) per Base Station: {avg_unserviced_traffic_demand_bs:.3f}")
+            f.write(f"\nPercentage of Total Cellular Traffic Demand Met: {percent_traffic_demand_met_bs:.3f}%\n")
+
+            # for unit_id in bs_congestion:
+            #     x, y = db.database[unit_id].position
+            #     f.write(f"Unit {unit_id} Pos {(x, y)}: {bs_congestion[unit_id]}\n")
+
+            f.write(f"\n=============================================================================\n")
+            f.write(f"=============================================================================\n")
+            f.write(f"=============================================================================\n")
+            self.writer.write_text(self.report_file_path, f.getvalue())
+
+            yearly_stats["congested_hs_percent"].append(congested_hs)
+            yearly_stats["congested_bs_percent"].append(congested_bs)
+            yearly_stats["percent_traffic_demand_met_hs"].append(percent_traffic_demand_met_hs)
+            yearly_stats["percent_traffic_demand_met_bs"].append(percent_traffic_demand_met_bs)
+            self.writer.emit("year", {
+                "year": year,
+                "congested_hs_percent": congested_hs,
+                "congested_bs_percent": congested_bs,
+                "percent_traffic_demand_met_hs": percent_traffic_demand_met_hs,
+                "percent_traffic_demand_met_bs": percent_traffic_demand_met_bs,
+            }, level=records.YEAR, text=format_year_record)
+            for row in aggregate_rows(year, self.year_table):
+                self.writer.emit("aggregate", row, level=records.YEAR)
+
+    def make_requests(self):
+        """
+        Every unit asks the database for the spectrum its current demand needs
+        (NetworkUnit.make_request for the whole store at once).
+        """
+        units = self.db.units
+        required_bw = units.traffic_demand / 2
+        unserved = units.bandwidth == 0
+        # units that already have bandwidth ask for the excess once it is 10 Mbps or more
+        short = ~unserved & (units.traffic_demand - units.bandwidth * 2 >= 10)
+        requesting = np.flatnonzero(unserved | short)
+        self.db.request_queue.put_many(requesting, np.where(unserved, required_bw, required_bw - units.bandwidth)[requesting])
+
+    def checkpoint_path(self):
+        return os.path.join(self.output_dir, "checkpoints", f"y{self.year}_d{self.day}.npz")
+
+    def save_checkpoint(self, path=None):
+        """
+        Writes everything needed to carry on from the current (year, day)
+        boundary to one .npz file: the unit columns and bands, the interference
+        graph, group totals, the density map, RNG states, stats and settings.
+        """
+        path = path if path is not None else self.checkpoint_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.history.flush()
+
+        units = self.db.units
+        band_units = sorted(units.frequency_bands)
+        bands = [(unit_id, start, end) for unit_id in band_units for start, end in sorted(units.frequency_bands[unit_id])]
+        bands = np.array(bands, dtype=np.float64).reshape(-1, 3)
+
+        state = {
+            "config": vars(self.config),
+            "year": self.year,
+            "day": self.day,
+            "demand_growth_rate": self.demand_growth_rate,
+            "yearly_stats": self.yearly_stats,
+            "yearly_congestion_hs": self.yearly_congestion_hs,
+            "yearly_congestion_bs": self.yearly_congestion_bs,
+            "daily_snapshot_stats": dict(self.daily_snapshot_stats),
+            "wifi_freq_range": self.db.wifi_freq_range,
+            "cellular_freq_range": self.db.cellular_freq_range,
+            "demand_rng": self.demand_generator.rng.bit_generator.state,
+            "request_rng": self.request_scheduler.rng.bit_generator.state if self.request_scheduler is not None else None,
+            # relative to the checkpoint, so it can be resumed from any working directory
+            "history_path": os.path.relpath(os.path.abspath(self.history.path), os.path.dirname(os.path.abspath(path))),
+            "history_count": self.history.count,
+        }
+        np.savez(path,
+                 state=np.array(json.dumps(encode_state(state))),
+                 population_density=self.population_density,
+                 group_freq=self.group_freq,
+                 year_table=self.year_table if self.year_table is not None else np.zeros(0),
+                 block_totals=self.block_stats.totals if self.block_stats is not None else np.zeros(0),
+                 adjacency_indptr=self.adjacency.indptr,
+                 adjacency_indices=self.adjacency.indices,
+                 bands=bands,
+                 **{f"unit_{name}": column for name, column in units.columns().items()})
+        message = f"Checkpoint written to {path}"
+        if self.writer is not None and not self.writer.closed:
+            self.writer.echo(message, records.YEAR)
+        elif records.YEAR <= self.config.VERBOSITY:
+            print(message)
+        return path
+
+    @classmethod
+    def from_checkpoint(cls, path, **overrides):
+        """
+        Rebuilds a simulation from a checkpoint, ready to continue with
+        simulate_dynamic_allocation(). Settings can be overridden for the rest of
+        the run (e.g. MODE, spectrum_split, NUM_YEARS, OUTPUT_DIR) to fork
+        what-if branches; changing D_w / D_c regroups the units from scratch.
+        """
+        from scipy.sparse import csr_matrix
+
+        with np.load(path) as data:
+            state = decode_state(json.loads(str(data["state"])))
+            saved = state["config"]
+            cfg = make_config(SimpleNamespace(**saved), **overrides)
+
+            sim = cls.__new__(cls)
+            sim._init_run(cfg)
+            sim.population_density = data["population_density"]
+            sim.year_table = data["year_table"] if data["year_table"].size else None
+            sim.db = Database(cfg.MODE, cfg.spectrum_split)
+            units = sim.db.units
+            units.load_columns({name: data[f"unit_{name}"] for name in UnitStore.COLUMNS})
+            for unit_id, start, end in data["bands"].tolist():
+                units.frequency_bands[int(unit_id)].add((start, end))
+            sim.db.wifi_freq_range = state["wifi_freq_range"]
+            sim.db.cellular_freq_range = state["cellular_freq_range"]
+            sim.total_num_hs = units.count(UnitType.HS)
+            sim.total_num_bs = units.count(UnitType.BS)
+            if cfg.BLOCK_STATS:
+                sim.block_stats = BlockStats(os.path.join(sim.output_dir, "blocks"), units,
+                                             sim.population_density, sim.block_size)
+                if data["block_totals"].size:
+                    sim.block_stats.totals[:] = data["block_totals"]
+
+            if (sim.D_w, sim.D_c) != (saved["D_w"], saved["D_c"]):
+                sim._build_groups()
+            else:
+                sim.adjacency = csr_matrix((np.ones(len(data["adjacency_indices"]), dtype=np.int8),
+                                            data["adjacency_indices"], data["adjacency_indptr"]),
+                                           shape=(len(units), len(units)))
+                sim.group_freq = data["group_freq"].copy()
+
+        sim.demand_generator = DemandGenerator(cfg.traffic_demand_bounds, sim.streams["demand"])
+        sim.demand_generator.rng.bit_generator.state = state["demand_rng"]
+        if sim.request_scheduler is not None and state["request_rng"] is not None:
+            sim.request_scheduler.rng.bit_generator.state = state["request_rng"]
+
+        sim.year = state["year"]
+        sim.day = state["day"]
+        sim.demand_growth_rate = state["demand_growth_rate"]
+        sim.yearly_stats = state["yearly_stats"]
+        sim.yearly_congestion_hs = state["yearly_congestion_hs"]
+        sim.yearly_congestion_bs = state["yearly_congestion_bs"]
+        sim.daily_snapshot_stats.update(state["daily_snapshot_stats"])
+
+        history_path = os.path.join(os.path.dirname(os.path.abspath(path)), state["history_path"])
+        sim.open_history(resume_from=history_path, resume_count=state["history_count"])
+        return sim
+
+    def simulate_dynamic_allocation(self):
+        if self.history is None:
+            self.open_history()
+        self.writer = records.RecordWriter(os.path.join(self.output_dir, "records"),
+                                           self.config.VERBOSITY, self.config.RECORDS_FORMAT)
+        try:
+            self._simulate_years()
+            self.save_metrics()
+            if self.timer.enabled:
+                self.write_phase_summary()
+        finally:
+            self.writer.close()
+
+    def write_phase_summary(self):
+        """Emits one "phase" record per timed phase and prints the summary table."""
+        for record in self.timer.records():
+            self.writer.emit("phase", record, level=records.QUIET)
+        self.writer.echo(f"\nTime per phase:\n{self.timer.summary()}", records.YEAR)
+
+    def _simulate_years(self):
+        db = self.db
+        total_num_hs, total_num_bs = self.total_num_hs, self.total_num_bs
+        daily_snapshot_stats = self.daily_snapshot_stats
+        writer = self.writer
+        timer = self.timer
+
+        while self.year < self.num_years:
+            year = self.year
+            if self.day == 0:
+                writer.echo(f"\nStarting Year {year + 1}...\n", records.YEAR)
+                # AGGREGATE_FIELDS summed over the year per (snapshot, density, unit type)
+                self.year_table = np.zeros((6, 3, len(UnitType), len(AGGREGATE_FIELDS)))
+            units = db.units
+            hs_mask = units.mask(UnitType.HS)
+            bs_mask = units.mask(UnitType.BS)
+
+            for day in range(self.day, self.num_days):
+                writer.echo(f"\n  Starting Day {day + 1}...\n", records.SNAPSHOT)
+
+                units.bandwidth[:] = 0
+                units.congested[:] = False
+
+                for snapshot in range(6):
+                    timer.begin_snapshot(year, day, snapshot)
+
+                    with timer.phase("stats"):
+                        # Congestion left over from the previous snapshot's allocation
+                        hs_congested = int(np.count_nonzero(units.congested & hs_mask))
+                        bs_congested = int(np.count_nonzero(units.congested & bs_mask))
+
+                    with timer.phase("demand"):
+                        units.traffic_demand = self.demand_generator.draw(snapshot, units.unit_type, units.density, self.demand_growth_rate)
+                    with timer.phase("make_request"):
+                        self.make_requests()
+
+                    with timer.phase("stats"):
+                        total_hs_requested = int(units.traffic_demand[hs_mask].sum())
+                        total_bs_requested = int(units.traffic_demand[bs_mask].sum())
+
+                        # ---- Diagnostic Logging ----
+                        total_wifi_demand = total_hs_requested
+                        total_cellular_demand = total_bs_requested
+
+                        # Unit positions don't change between snapshots, so these are computed once
+                        hotspot_group_sizes = db.grouping_cache.group_sizes(UnitType.HS, self.D_w)
+                        base_station_group_sizes = db.grouping_cache.group_sizes(UnitType.BS, self.D_c)
+
+                        snapshot_record = {
+                            "year": year,
+                            "day": day,
+                            "snapshot": snapshot,
+                            "wifi_range": db.wifi_freq_range[1] - db.wifi_freq_range[0],
+                            "total_wifi_demand": total_wifi_demand,
+                            "total_cellular_demand": total_cellular_demand,
+                            "avg_hs_demand": total_wifi_demand / total_num_hs,
+                            "avg_bs_demand": total_cellular_demand / total_num_bs,
+                            "num_hs_groups": len(hotspot_group_sizes),
+                            "avg_hs_group_size": float(hotspot_group_sizes.mean()),
+                            "num_bs_groups": len(base_station_group_sizes),
+                            "avg_bs_group_size": float(base_station_group_sizes.mean()),
+                            "hs_congested": hs_congested,
+                            "bs_congested": bs_congested,
+                        }
+
+                    with timer.phase("allocate"):
+                        snapshot_record.update(db.request_queue.stats())
+                        db.request_queue.reset_stats()
+                        request_ids, request_bandwidths = drain_requests(db.request_queue)
+                        if self.request_scheduler is None:
+                            allocate_spectrum(db, self.group_freq, request_ids, request_bandwidths)
+                        else:
+                            snapshot_start = (year * self.num_days + day) * 24 + SNAPSHOT_START_HOURS[snapshot]
+                            snapshot_record.update(self.request_scheduler.run_snapshot(
+                                db, self.group_freq, snapshot_start, get_snapshot_duration(snapshot),
+                                request_ids, request_bandwidths))
+                    snapshot_record["requests"] = len(request_ids)
+
+                    if self.assign_channels:
+                        with timer.phase("channels"):
+                            starts, ends, narrowed = assign_channels(units, self.adjacency, db.wifi_freq_range, db.cellular_freq_range)
+                            snapshot_record["hs_spectral_reuse"] = spectral_reuse(units, starts, ends, UnitType.HS, db.wifi_freq_range)
+                            snapshot_record["bs_spectral_reuse"] = spectral_reuse(units, starts, ends, UnitType.BS, db.cellular_freq_range)
+                            snapshot_record["narrowed_units"] = int(np.count_nonzero(narrowed))
+                    writer.emit("snapshot", snapshot_record, level=records.SNAPSHOT, text=format_snapshot_record)
+
+                    with timer.phase("update_ratios"):
+                        db.update_ratios(snapshot)
+
+                    with timer.phase("stats"):
+                        daily_snapshot_stats["hs_congestion"][snapshot].append(hs_congested / total_num_hs * 100)
+                        daily_snapshot_stats["bs_congestion"][snapshot].append(bs_congested / total_num_bs * 100)
+                        daily_snapshot_stats["hs_bandwidth"][snapshot].append(db.cellular_freq_range[1] - db.cellular_freq_range[0])
+                        daily_snapshot_stats["bs_bandwidth"][snapshot].append(db.wifi_freq_range[1] - db.wifi_freq_range[0])
+                        self.year_table[snapshot] += aggregate_units(units)
+                        if self.block_stats is not None:
+                            self.block_stats.add(units, snapshot)
+
+                    with timer.phase("history"):
+                        self.record_history(year, day, snapshot)
+
+                    profile_path = timer.end_snapshot()
+                    if profile_path is not None:
+                        writer.echo(f"cProfile stats for year {year + 1}, day {day + 1}, snapshot {snapshot} written to {profile_path}", records.YEAR)
+
+                self.day = day + 1
+                if self.checkpoint_interval == "day" and self.day < self.num_days:
+                    self.save_checkpoint()
+            
+            self.history.flush()
+
+
+            # congestion is counted as it enters each snapshot: what the previous
+            # snapshot's allocation left, and none at the start of a day
+            congested = self.year_table[:-1, ..., AGGREGATE_FIELDS.index("congested")].sum(axis=0).astype(np.int64)
+            totals = self.year_table[..., AGGREGATE_FIELDS.index("units")].sum(axis=0).astype(np.int64)
+            for d in [0, 1, 2]:
+                hs_ratio = 100 * int(congested[d, UnitType.HS.value]) / max(1, int(totals[d, UnitType.HS.value]))
+                bs_ratio = 100 * int(congested[d, UnitType.BS.value]) / max(1, int(totals[d, UnitType.BS.value]))
+                # print(f"[DEBUG] Appending to congestion stats — Year {year}, Density {d}, BS Ratio = {bs_ratio}")
+                # print(f"[DEBUG] yearly_density_congestion_bs[{d}] = {yearly_density_congestion_bs[d]}, bs_total[{d}] = {bs_total[d]}")
+                self.yearly_congestion_hs[d].append(hs_ratio)
+                self.yearly_congestion_bs[d].append(bs_ratio)
            
-        print(f"\nDatabase after Year {year + 1}, Day {day + 1}:\n")
-        print_database_state(db, group_dict)
-        demand_growth_rate *= 1.5
+            if writer.enabled(records.DEBUG):
+                writer.echo(f"\nDatabase after Year {year + 1}, Day {day + 1}:\n", records.DEBUG)
+                units_state = db.units.copy()
+                writer.echo(lambda: format_database_state(units_state, self.adjacency), records.DEBUG)
+            self.demand_growth_rate *= 1.5
         
-        generate_report(year, total_num_hs, total_num_bs)
+            with timer.phase("report"):
+                self.generate_report(year)
+                if self.block_stats is not None:
+                    self.block_stats.flush(year, self.num_days)
+
+            self.year += 1
+            self.day = 0
+            if self.checkpoint_interval in ("year", "day"):
+                self.save_checkpoint()
+
+    def save_metrics(self):
+        """
+        Writes what the figures are drawn from to the output directory:
+        metrics.json (the yearly and per-snapshot stats) and layout.npz (the
+        unit positions / types / densities and the population density map).
+        render.py regenerates the figures from these and the history.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        metrics = {
+            "num_years": self.num_years,
+            "num_days": self.num_days,
+            "D_w": self.D_w,
+            "D_c": self.D_c,
+            "city_size": self.city_size,
+            "block_size": self.block_size,
+            "animation_frames": self.config.ANIMATION_FRAMES,
+            "yearly_stats": self.yearly_stats,
+            "yearly_congestion_hs": self.yearly_congestion_hs,
+            "yearly_congestion_bs": self.yearly_congestion_bs,
+            "daily_snapshot_stats": dict(self.daily_snapshot_stats),
+        }
+        with open(os.path.join(self.output_dir, "metrics.json"), "w") as f:
+            json.dump(encode_state(metrics), f)
+        units = self.db.units
+        np.savez(os.path.join(self.output_dir, "layout.npz"), position=units.position, unit_type=units.unit_type,
+                 density=units.density, population_density=self.population_density)
+
+    def plot_results(self, figures=None, max_workers=None):
+        """Renders the figures of the finished run (all of render.FIGURES by default) in worker processes."""
+        import render
+
+        render.render_run(self.output_dir, figures, max_workers=max_workers)
 
 if __name__ == "__main__":
-    open(report_file_path, "w").close()
-    simulate_dynamic_allocation(demand_growth_rate)
-    plot_units(UnitType.BS, "bs_units_distance", db, D_c)
-    plot_units(UnitType.HS, "hs_units_distance", db, D_w)
-    plot_yearly_congestion(yearly_congestion_bs, "BS")
-    plot_yearly_congestion(yearly_congestion_hs, "HS")
-    plot_congestion_heatmap(yearly_congestion_bs, "BS")
-    plot_congestion_heatmap(yearly_congestion_hs, "HS")
-    animate_congestion(db_snapshots, UnitType.HS, "hs_congestion", city_size=(100, 100), population_density=population_density)
-    animate_congestion(db_snapshots, UnitType.BS, "bs_congestion", city_size=(100, 100), population_density=population_density)
-    # animate_congestion(db_snapshots, population_density, UnitType.HS, "hs_congestion", city_size)
-    # animate_congestion(db_snapshots, population_density, UnitType.BS, "bs_congestion", city_size)
-    # animate_congestion(db_snapshots, UnitType.HS, "hs_congestion", city_size)
-    # animate_congestion(db_snapshots, UnitType.BS, "bs_congestion", city_size)
-    
\ No newline at end of file
+    sim = Simulation(config)
+    open(sim.report_file_path, "w").close()
+    sim.simulate_dynamic_allocation()
+    sim.plot_results()
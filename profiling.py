@@ -0,0 +1,124 @@
+"""
+Phase timers for the simulation loop.
+
+    timer = PhaseTimer(enabled=True, profile_snapshot=(0, 0, 3), profile_path="outputs/profile")
+    with timer.phase("demand"):
+        ...
+    print(timer.summary())
+
+When disabled, phase() returns a shared no-op context manager, so the hooks can
+stay in the loop permanently. A phase entered while another one is running
+counts towards the outer one. With track_memory, the peak tracemalloc memory
+of every phase is recorded too (tracemalloc must be tracing; its allocation
+hooks slow everything down, so don't use those timings as wall times).
+If profile_snapshot is set, the whole of that one (year, day, snapshot) is
+also run under cProfile and dumped to
+<profile_path>_y<year>_d<day>_s<snapshot>.prof (open it with pstats or snakeviz).
+"""
+import time
+import cProfile
+import tracemalloc
+import contextlib
+from collections import defaultdict
+
+_NULL = contextlib.nullcontext()
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start", "start_bytes", "outer")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        timer = self.timer
+        self.outer = timer._active is None
+        if not self.outer:
+            return
+        timer._active = self.name
+        if timer.track_memory:
+            tracemalloc.reset_peak()
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if not self.outer:
+            return False
+        timer = self.timer
+        timer.seconds[self.name] += time.perf_counter() - self.start
+        timer.calls[self.name] += 1
+        if timer.track_memory:
+            peak = tracemalloc.get_traced_memory()[1] - self.start_bytes
+            timer.peak_bytes[self.name] = max(timer.peak_bytes[self.name], peak)
+        timer._active = None
+        return False
+
+
+class PhaseTimer:
+    """Accumulates wall time and call counts (and optionally peak memory) per named phase."""
+    def __init__(self, enabled=False, profile_snapshot=None, profile_path="profile", track_memory=False):
+        self.enabled = enabled
+        self.track_memory = track_memory
+        self.profile_snapshot = tuple(profile_snapshot) if profile_snapshot is not None else None
+        self.profile_path = profile_path
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.peak_bytes = defaultdict(int)
+        self._active = None
+        self._profiler = None
+        self._profiled = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL
+        return _Phase(self, name)
+
+    def wrap(self, name, fn):
+        """Returns fn with every call timed as the given phase."""
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return fn(*args, **kwargs)
+        return timed
+
+    def begin_snapshot(self, year, day, snapshot):
+        """Starts cProfile if this is the chosen snapshot."""
+        if self.profile_snapshot == (year, day, snapshot):
+            self._profiled = (year, day, snapshot)
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def end_snapshot(self):
+        """Stops cProfile and dumps its stats; returns the dump path, or None if nothing was profiled."""
+        if self._profiler is None:
+            return None
+        self._profiler.disable()
+        year, day, snapshot = self._profiled
+        path = f"{self.profile_path}_y{year}_d{day}_s{snapshot}.prof"
+        self._profiler.dump_stats(path)
+        self._profiler = None
+        return path
+
+    def records(self):
+        """One {phase, calls, total_s, mean_ms, percent[, peak_mb]} dict per phase, slowest first."""
+        total = sum(self.seconds.values())
+        records = []
+        for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            record = {
+                "phase": name,
+                "calls": self.calls[name],
+                "total_s": seconds,
+                "mean_ms": 1000 * seconds / self.calls[name],
+                "percent": 100 * seconds / total if total else 0.0,
+            }
+            if self.track_memory:
+                record["peak_mb"] = self.peak_bytes[name] / 2**20
+            records.append(record)
+        return records
+
+    def summary(self):
+        lines = [f"{'phase':<16}{'calls':>8}{'total (s)':>12}{'mean (ms)':>12}{'%':>8}"]
+        for record in self.records():
+            lines.append(f"{record['phase']:<16}{record['calls']:>8}{record['total_s']:>12.3f}"
+                         f"{record['mean_ms']:>12.3f}{record['percent']:>8.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,169 @@
+"""
+Background writer for simulation output.
+
+The simulation thread only puts small items on a queue; a writer thread
+batches them to disk (structured records as JSON lines or CSV, plain text
+appended to files such as report.log) and echoes terminal output according to
+the verbosity level. Terminal text can be passed as a callable so that the
+formatting also happens on the writer thread.
+
+The queue is bounded, so a simulation that outruns the disk blocks instead of
+buffering without limit. If writing fails, the writer thread keeps draining
+the queue and the exception is re-raised by the next emit / echo /
+write_text, or by close().
+"""
+import os
+import csv
+import sys
+import json
+import queue
+import threading
+
+# Verbosity levels for terminal output
+QUIET = 0      # nothing
+YEAR = 1       # year progress and the yearly report summary
+SNAPSHOT = 2   # day / snapshot progress, demand averages and group diagnostics
+DEBUG = 3      # full database dump after every year
+
+_STOP = object()
+
+
+class RecordWriter:
+    """
+    Writes records, text and terminal output on a background thread.
+
+        writer = RecordWriter("outputs/records", verbosity=YEAR)
+        writer.emit("snapshot", {"year": 0, ...}, level=SNAPSHOT, text=format_fn)
+        writer.close()
+
+    records_path is the file name without extension: records go to
+    <records_path>.jsonl, or to <records_path>_<kind>.csv with fmt="csv".
+    At most max_queued items wait for the writer thread at a time.
+    """
+    def __init__(self, records_path=None, verbosity=YEAR, fmt="jsonl", batch_size=256, stream=None,
+                 max_queued=10_000):
+        assert fmt in ("jsonl", "csv"), f"[RecordWriter]: Unknown records format {fmt}."
+        self.records_path = records_path
+        self.verbosity = verbosity
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.stream = stream if stream is not None else sys.stdout
+
+        self.closed = False
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error = None
+        self._files = {}
+        self._csv_writers = {}
+        self._thread = threading.Thread(target=self._run, name="RecordWriter", daemon=True)
+        self._thread.start()
+
+    def enabled(self, level):
+        """True if terminal output at this level would be shown."""
+        return level <= self.verbosity
+
+    def echo(self, text, level=YEAR):
+        """Prints text (or the string returned by calling it) if level is enabled."""
+        if self.enabled(level):
+            self._put(("echo", None, text))
+
+    def emit(self, kind, record, level=SNAPSHOT, text=None):
+        """
+        Queues a structured record of the given kind. If text is a callable it is
+        called with the record on the writer thread to produce terminal output.
+        """
+        if self.records_path is not None:
+            self._put(("record", kind, record))
+        if text is not None and self.enabled(level):
+            self._put(("echo", None, lambda: text(record)))
+
+    def write_text(self, path, text):
+        """Appends text to the file at path."""
+        self._put(("text", path, text))
+
+    def close(self):
+        """
+        Waits for everything queued so far to be written and closes the files.
+        Re-raises the exception that stopped the writer thread, if any.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self.closed = True
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._csv_writers.clear()
+        self._raise_error()
+
+    def _put(self, item):
+        self._raise_error()
+        self._queue.put(item)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _file(self, path):
+        f = self._files.get(path)
+        if f is None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = self._files[path] = open(path, "a", newline="")
+        return f
+
+    def _write_record(self, kind, record):
+        if self.fmt == "jsonl":
+            f = self._file(f"{self.records_path}.jsonl")
+            f.write(json.dumps({"kind": kind, **record}))
+            f.write("\n")
+            return
+
+        path = f"{self.records_path}_{kind}.csv"
+        writer = self._csv_writers.get(path)
+        if writer is None:
+            f = self._file(path)
+            writer = self._csv_writers[path] = csv.DictWriter(f, fieldnames=list(record))
+            if f.tell() == 0:
+                writer.writeheader()
+        writer.writerow(record)
+
+    def _handle(self, item):
+        action, target, payload = item
+        if callable(payload):
+            payload = payload()
+        if action == "record":
+            self._write_record(target, payload)
+        elif action == "text":
+            self._file(target).write(payload)
+        elif action == "echo":
+            self.stream.write(payload)
+            self.stream.write("\n")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                elif self._error is None:
+                    try:
+                        self._handle(item)
+                    except Exception as e:
+                        # keep draining so producers blocked on the full queue wake up
+                        self._error = e
+
+            if self._error is None:
+                try:
+                    for f in self._files.values():
+                        f.flush()
+                    self.stream.flush()
+                except Exception as e:
+                    self._error = e
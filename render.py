@@ -0,0 +1,142 @@
+"""
+Offline renderer: redraws the figures of a finished run from what the
+simulation saved to its OUTPUT_DIR, so styling changes don't need a rerun and
+the simulation process never imports matplotlib. Every figure is drawn in its
+own worker process.
+
+    python render.py outputs                                  # every figure
+    python render.py outputs --figures yearly_stats heatmaps  # a subset
+    python render.py outputs --out restyled --workers 4 --frames all
+
+A run directory holds metrics.json and layout.npz (written by
+Simulation.save_metrics at the end of the run) and history/ (the per-unit
+history the congestion animations are drawn from).
+"""
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import networks
+from networks import UnitType, UnitStore, HistoryStore
+
+
+def load_metrics(run_dir):
+    with open(os.path.join(run_dir, "metrics.json")) as f:
+        return networks.decode_state(json.load(f))
+
+
+def load_layout(run_dir):
+    """Returns the run's units (positions, types and densities only) and its population density map."""
+    with np.load(os.path.join(run_dir, "layout.npz")) as layout:
+        units = UnitStore(capacity=max(len(layout["unit_type"]), 1))
+        units.add_units(layout["position"], layout["unit_type"], layout["density"])
+        return units, layout["population_density"]
+
+
+def city_extent(metrics):
+    # city_size is (rows, cols); x runs along the columns
+    rows, cols = metrics["city_size"]
+    return (cols * metrics["block_size"], rows * metrics["block_size"])
+
+
+def draw_day1_snapshots(run_dir, out_dir, frames):
+    metrics = load_metrics(run_dir)
+    networks.plot_day1_snapshots(metrics["daily_snapshot_stats"], metrics["num_years"], out_dir)
+
+
+def draw_yearly_stats(run_dir, out_dir, frames):
+    metrics = load_metrics(run_dir)
+    networks.plot_yearly_stats(metrics["yearly_stats"], metrics["num_years"], out_dir)
+
+
+def draw_density_congestion(run_dir, out_dir, frames):
+    metrics = load_metrics(run_dir)
+    networks.plot_yearly_congestion(metrics["yearly_congestion_bs"], "BS", metrics["num_years"], out_dir)
+    networks.plot_yearly_congestion(metrics["yearly_congestion_hs"], "HS", metrics["num_years"], out_dir)
+
+
+def draw_heatmaps(run_dir, out_dir, frames):
+    metrics = load_metrics(run_dir)
+    networks.plot_congestion_heatmap(metrics["yearly_congestion_bs"], "BS", metrics["num_years"], out_dir)
+    networks.plot_congestion_heatmap(metrics["yearly_congestion_hs"], "HS", metrics["num_years"], out_dir)
+
+
+def draw_units(unit_type):
+    def draw(run_dir, out_dir, frames):
+        metrics = load_metrics(run_dir)
+        units, _ = load_layout(run_dir)
+        threshold = metrics["D_w"] if unit_type == UnitType.HS else metrics["D_c"]
+        networks.plot_units(unit_type, f"{unit_type.name.lower()}_units_distance", units, threshold, out_dir)
+    return draw
+
+
+def draw_animation(unit_type):
+    def draw(run_dir, out_dir, frames):
+        metrics = load_metrics(run_dir)
+        units, population_density = load_layout(run_dir)
+        history = HistoryStore.open(os.path.join(run_dir, "history"))
+        networks.animate_congestion(history, units.position, units.unit_type, unit_type,
+                                    f"{unit_type.name.lower()}_congestion", city_extent(metrics),
+                                    population_density, out_dir, frames or metrics["animation_frames"])
+    return draw
+
+
+# figure name -> function(run_dir, out_dir, frames) that draws it
+FIGURES = {
+    "day1_snapshots": draw_day1_snapshots,
+    "yearly_stats": draw_yearly_stats,
+    "density_congestion": draw_density_congestion,
+    "heatmaps": draw_heatmaps,
+    "bs_units": draw_units(UnitType.BS),
+    "hs_units": draw_units(UnitType.HS),
+    "hs_animation": draw_animation(UnitType.HS),
+    "bs_animation": draw_animation(UnitType.BS),
+}
+
+
+def render_figure(name, run_dir, out_dir, frames=None):
+    FIGURES[name](run_dir, out_dir, frames)
+    return name
+
+
+def render_run(run_dir, figures=None, out_dir=None, max_workers=None, frames=None):
+    """
+    Draws the given figures (all of FIGURES by default) of the run in run_dir
+    into out_dir (default run_dir) on max_workers processes (None = one per
+    CPU, 1 = no pool). frames overrides the run's ANIMATION_FRAMES.
+    Returns the names of the figures drawn.
+    """
+    figures = list(FIGURES) if figures is None else list(figures)
+    unknown = [name for name in figures if name not in FIGURES]
+    assert not unknown, f"[render_run]: Unknown figures {unknown}, expected some of {list(FIGURES)}."
+    out_dir = run_dir if out_dir is None else out_dir
+
+    if max_workers == 1:
+        return [render_figure(name, run_dir, out_dir, frames) for name in figures]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(render_figure, name, run_dir, out_dir, frames) for name in figures]
+        for future in as_completed(futures):
+            future.result()
+    return figures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redraw the figures of a finished simulation run.")
+    parser.add_argument("run_dir", help="the run's OUTPUT_DIR")
+    parser.add_argument("--figures", nargs="+", choices=list(FIGURES), default=None, help="defaults to every figure")
+    parser.add_argument("--out", default=None, help="directory for the figures (defaults to run_dir)")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of CPUs")
+    parser.add_argument("--frames", choices=["year", "all"], default=None,
+                        help="congestion animation frames (defaults to the run's ANIMATION_FRAMES)")
+    args = parser.parse_args()
+
+    figures = render_run(args.run_dir, args.figures, args.out, args.workers, args.frames)
+    print(f"Rendered {len(figures)} figures to {args.out or args.run_dir}: {', '.join(figures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Scenario runner: runs many (mode, seed, replica, spectrum_split, D_w, D_c) combinations
+of the city simulation in parallel and merges their yearly stats into one table.
+
+Every scenario builds its own networks.Simulation in a worker process and
+writes its report.log, output.log and outputs/ to <out>/<scenario name>/.
+Replicas of a seed share nothing but the seed: each draws from its own child
+streams of SeedSequence(seed) (see networks.make_streams).
+
+With --sweep, the parent places every (seed, replica) city once and builds the
+groups of all its D_w / D_c values with one networks.GroupSweep, so the
+interference pairs are searched once per city instead of once per scenario.
+Every scenario still runs in its own worker and gets its (group_id,
+adjacency) with the task.
+
+Example:
+    python scenarios.py --modes Dynamic Static_Range --seeds 0 1 2 --replicas 4 --splits 30 50 --out runs
+"""
+import os
+import csv
+import argparse
+import itertools
+import contextlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import config
+import networks
+
+Scenario = namedtuple("Scenario", ["mode", "seed", "replica", "spectrum_split", "D_w", "D_c"])
+
+MODES = ["Dynamic", "Cellular_Static", "Wifi_Static", "Static_Range"]
+
+RESULT_FIELDS = (
+    list(Scenario._fields)
+    + ["year", "congested_hs_percent", "congested_bs_percent",
+       "percent_traffic_demand_met_hs", "percent_traffic_demand_met_bs"]
+    + [f"hs_density_{d}_congestion" for d in [0, 1, 2]]
+    + [f"bs_density_{d}_congestion" for d in [0, 1, 2]]
+)
+
+
+def scenario_name(scenario):
+    return (f"{scenario.mode}_seed{scenario.seed}_r{scenario.replica}_split{scenario.spectrum_split}"
+            f"_Dw{scenario.D_w}_Dc{scenario.D_c}")
+
+
+def make_scenarios(modes, seeds, splits, D_ws, D_cs, replicas=1):
+    """Returns the cartesian product of the given parameter values, with replicas 0 .. replicas-1 of every seed."""
+    return [Scenario(*values) for values in itertools.product(modes, seeds, range(replicas), splits, D_ws, D_cs)]
+
+
+def run_scenario(scenario, out_dir, groups=None):
+    """
+    Runs one scenario and returns its yearly stats as a list of table rows.
+    groups is the scenario's prebuilt (group_id, adjacency), if any.
+    """
+    run_dir = os.path.join(out_dir, scenario_name(scenario))
+    os.makedirs(run_dir, exist_ok=True)
+
+    with open(os.path.join(run_dir, "output.log"), "w") as log, contextlib.redirect_stdout(log):
+        sim = networks.Simulation(
+            config,
+            groups,
+            MODE=scenario.mode,
+            SEED=scenario.seed,
+            REPLICA=scenario.replica,
+            spectrum_split=scenario.spectrum_split,
+            D_w=scenario.D_w,
+            D_c=scenario.D_c,
+            OUTPUT_DIR=os.path.join(run_dir, "outputs"),
+            REPORT_FILE=os.path.join(run_dir, "report.log"),
+        )
+        open(sim.report_file_path, "w").close()
+        sim.simulate_dynamic_allocation()
+
+    rows = []
+    for year in range(sim.num_years):
+        row = scenario._asdict()
+        row["year"] = year + 1
+        for key, values in sim.yearly_stats.items():
+            row[key] = values[year]
+        for d in [0, 1, 2]:
+            row[f"hs_density_{d}_congestion"] = sim.yearly_congestion_hs[d][year]
+            row[f"bs_density_{d}_congestion"] = sim.yearly_congestion_bs[d][year]
+        rows.append(row)
+    return rows
+
+
+def swept_groups(scenarios):
+    """
+    Yields (index, (group_id, adjacency)) for every scenario. Each (seed,
+    replica) city is placed once, and one GroupSweep over it builds the groups
+    of all its D_w / D_c values (shared by its modes and splits).
+    """
+    cities = {}
+    for i, scenario in enumerate(scenarios):
+        cities.setdefault((scenario.seed, scenario.replica), []).append(i)
+
+    for (seed, replica), indices in cities.items():
+        units = networks.UnitStore()
+        networks.place_city(networks.make_config(config, SEED=seed, REPLICA=replica), units,
+                            networks.make_streams(seed, replica))
+        sweep = networks.GroupSweep(max(scenarios[i].D_w for i in indices), max(scenarios[i].D_c for i in indices))
+        groups = {}
+        for i in indices:
+            key = (scenarios[i].D_w, scenarios[i].D_c)
+            if key not in groups:
+                groups[key] = sweep.groups(units, *key)
+            yield i, groups[key]
+
+
+def run_scenarios(scenarios, out_dir, max_workers=None, sweep=False):
+    """
+    Runs every scenario on a process pool and returns all rows, ordered like
+    scenarios. With sweep, the groups are built here, one city at a time, and
+    sent to the workers with their scenarios.
+    """
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    tasks = swept_groups(scenarios) if sweep else ((i, None) for i in range(len(scenarios)))
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_scenario, scenarios[i], out_dir, groups): i for i, groups in tasks}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            print(f"[{len(results)}/{len(scenarios)}] finished {scenario_name(scenarios[i])}")
+
+    return [row for i in range(len(scenarios)) for row in results[i]]
+
+
+def write_results(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run simulation scenarios in parallel.")
+    parser.add_argument("--modes", nargs="+", default=[config.MODE], choices=MODES)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[config.SEED])
+    parser.add_argument("--replicas", type=int, default=1, help="independent runs per seed")
+    parser.add_argument("--splits", nargs="+", type=float, default=[config.spectrum_split])
+    parser.add_argument("--D_w", nargs="+", type=float, default=[config.D_w])
+    parser.add_argument("--D_c", nargs="+", type=float, default=[config.D_c])
+    parser.add_argument("--sweep", action="store_true",
+                        help="search the interference pairs once per seed and replica for all D_w / D_c values")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the number of CPUs")
+    parser.add_argument("--out", default="runs", help="directory for per-run outputs and results.csv")
+    args = parser.parse_args()
+
+    scenarios = make_scenarios(args.modes, args.seeds, args.splits, args.D_w, args.D_c, args.replicas)
+    rows = run_scenarios(scenarios, args.out, args.workers, args.sweep)
+
+    results_path = os.path.join(args.out, "results.csv")
+    write_results(rows, results_path)
+    print(f"Wrote {len(rows)} rows for {len(scenarios)} scenarios to {results_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from collections import deque
-from scipy.spatial.distance import cdist
+from scipy.spatial import cKDTree
 
 
 """
@@ -65,36 +64,40 @@ np.random.seed(42) #to keep the initialization the same
 population_density = np.random.choice([0, 1, 2], size=city_size, p=[0.3, 0.4, 0.3])
 
 #TODO:  Mbps demand acc to density - DISCUSS
-demand_map = {0: 500, 1: 2000, 2: 5000} 
-traffic_demand = np.vectorize(demand_map.get)(population_density) #mapping the population density to the traffic demand
+demand_map = np.array([500, 2000, 5000])
+traffic_demand = demand_map[population_density] #mapping the population density to the traffic demand
 
 """
 STEP 2: Placing BS and HS 
 """
-city_database = {} #initializing the db
-
-#looping thru the matrix 
-for x in range(city_size[0]):
-    for y in range(city_size[1]):
-        pop_density = population_density[x, y]
-        #setting the number of hs and bs acc to density 
-        if pop_density == 2:
-            hs_count = 10
-            bs_count = 5
-        elif pop_density == 1:
-            hs_count = 5
-            bs_count = 2
-        else:
-            hs_count = 3
-            bs_count = 1
-        city_database[(x, y)] = {
-            "traffic_demand": traffic_demand[x, y],
-            "hs_count": hs_count,
-            "bs_count": bs_count,
-            "wifi_range": 0, 
-            "cellular_range": 0,  
-            "status": "available"
-        }
+# HS / BS count per cell by density level (0, 1, 2)
+HS_PER_DENSITY = np.array([3, 5, 10])
+BS_PER_DENSITY = np.array([1, 2, 5])
+
+def counts_for_density(pop_density):
+    """
+    hs and bs count of every cell. Only the exact levels 1 and 2 get the
+    medium / high counts, anything else gets the low counts.
+    """
+    level = np.select([pop_density == 2, pop_density == 1], [2, 1], default=0)
+    return HS_PER_DENSITY[level], BS_PER_DENSITY[level]
+
+def make_city_database(population_density, traffic_demand):
+    """
+    Array-backed cell state: every entry is an array shaped like the city grid,
+    so cell (x, y) is entry [x, y] of each array.
+    """
+    hs_count, bs_count = counts_for_density(population_density)
+    return {
+        "traffic_demand": np.asarray(traffic_demand, dtype=float).copy(),
+        "hs_count": hs_count,
+        "bs_count": bs_count,
+        "wifi_range": np.zeros(population_density.shape),
+        "cellular_range": np.zeros(population_density.shape),
+        "congested": np.zeros(population_density.shape, dtype=bool), # status: congested or available
+    }
+
+city_database = make_city_database(population_density, traffic_demand) #initializing the db
 
 
 """
@@ -109,18 +112,14 @@ D_w, D_c = 20, 500  # WiFi and Cellular sharing distances
 # Function to distribute spectrum dynamically 
 # Assings wifi and cellular spectrum to each HS and BS at each location in the city
 def allocate_spectrum():
-    for (x, y), data in city_database.items():
-        total_hs = data["hs_count"]
-        total_bs = data["bs_count"]
-        
+    hs_count = city_database["hs_count"]
+    bs_count = city_database["bs_count"]
 
-        if total_hs > 0:
-            data["wifi_range"] = wifi_spectrum / total_hs #TODO: currently evenly diving spectrum across all units - shld do acc to traffic demand?
-        if total_bs > 0:
-            data["cellular_range"] = cellular_spectrum / total_bs #TODO: currently evenly diving spectrum across all units - shld do acc to traffic demand?
-        
-        #for debuggign
-        #print(f"Location ({x}, {y}) - WiFi Range: {data['wifi_range']} MHz, Cellular Range: {data['cellular_range']}")
+    #TODO: currently evenly diving spectrum across all units - shld do acc to traffic demand?
+    has_hs = hs_count > 0
+    city_database["wifi_range"][has_hs] = wifi_spectrum / hs_count[has_hs]
+    has_bs = bs_count > 0
+    city_database["cellular_range"][has_bs] = cellular_spectrum / bs_count[has_bs]
 
 # allocate_spectrum()
 
@@ -128,26 +127,37 @@ def allocate_spectrum():
 STEP 4: Allocate spectrum according to the rules for HS and BS based on distance.
 """
 
+def proximity_weights(has_units, distance_threshold):
+    """
+    For every cell, the sum of (1 - dist / distance_threshold) over all cells
+    with units (itself included) closer than distance_threshold; 0 for cells
+    without units. One sparse radius-neighbour query instead of a dense
+    cells x cells distance matrix.
+    """
+    cells = np.argwhere(has_units)
+    weights = np.zeros(has_units.shape)
+    if len(cells) == 0:
+        return weights
+
+    tree = cKDTree(cells)
+    # every (i, j, dist) pair within the threshold, (i, i, 0) included; pairs
+    # exactly at the threshold weigh 0 so it doesn't matter that they're in
+    pairs = tree.sparse_distance_matrix(tree, distance_threshold, output_type="ndarray")
+    weights[tuple(cells.T)] = np.bincount(pairs["i"], weights=1 - pairs["v"] / distance_threshold, minlength=len(cells))
+    return weights
+
 # Calculate distance-based spectrum sharing - based on the email
 # TODO: MAN IDK IF THIS IS RIGHT! 
 def distance_based_sharing():
-    hs_positions = [(x, y) for (x, y), data in city_database.items() if data["hs_count"] > 0]
-    bs_positions = [(x, y) for (x, y), data in city_database.items() if data["bs_count"] > 0]
-    
+    hs_count = city_database["hs_count"]
+    bs_count = city_database["bs_count"]
+
     # For each HS and BS, adjust spectrum allocation based on distance
-    for (x, y), data in city_database.items():
-        if data["hs_count"] > 0:
-            distances = cdist([[(x, y)]], hs_positions)[0]
-            for i, dist in enumerate(distances):
-                if dist < D_w:
-                    # Halving spectrum if distance is closer than D_w
-                    data["wifi_range"] -= (wifi_spectrum / data["hs_count"]) * (1 - (dist / D_w)) 
-        if data["bs_count"] > 0:
-            distances = cdist([[(x, y)]], bs_positions)[0]
-            for i, dist in enumerate(distances):
-                if dist < D_c:
-                    # Halve spectrum if distance is closer than D_c
-                    data["cellular_range"] -= (cellular_spectrum / data["bs_count"]) * (1 - (dist / D_c))  # Decrease based on distance
+    # Halving spectrum if distance is closer than D_w / D_c
+    has_hs = hs_count > 0
+    city_database["wifi_range"][has_hs] -= (wifi_spectrum / hs_count[has_hs]) * proximity_weights(has_hs, D_w)[has_hs]
+    has_bs = bs_count > 0
+    city_database["cellular_range"][has_bs] -= (cellular_spectrum / bs_count[has_bs]) * proximity_weights(has_bs, D_c)[has_bs]
 
 
 """
@@ -157,13 +167,11 @@ STEP 5: Congestion
 # Simulating congestion detection
 # is it meant to be this simple?? @nicole
 def detect_congestion():
-    for data in city_database.values():
-        if data["traffic_demand"] > data["wifi_range"] and data["hs_count"] > 0:
-            data["status"] = "congested"
-        elif data["traffic_demand"] > data["cellular_range"] and data["bs_count"] > 0:
-            data["status"] = "congested"
-        else:
-            data["status"] = "available"
+    data = city_database
+    city_database["congested"] = (
+        ((data["traffic_demand"] > data["wifi_range"]) & (data["hs_count"] > 0))
+        | ((data["traffic_demand"] > data["cellular_range"]) & (data["bs_count"] > 0))
+    )
 
 # detect_congestion()
 
@@ -172,52 +180,40 @@ def detect_congestion():
 """
 STEP 6: @ every 4 hours, change the traffic demand and adjust spectrum allocation.
 """
+# Traffic demand multiplier for every hour of the day
+#   6-9: 1.5, 9-12: 1.2, 12-14: 1.3, 14-18: 1.1, 18-20: 1.8, otherwise 0.5
+HOURLY_DEMAND_MULTIPLIER = np.full(24, 0.5)
+HOURLY_DEMAND_MULTIPLIER[6:9] = 1.5
+HOURLY_DEMAND_MULTIPLIER[9:12] = 1.2
+HOURLY_DEMAND_MULTIPLIER[12:14] = 1.3
+HOURLY_DEMAND_MULTIPLIER[14:18] = 1.1
+HOURLY_DEMAND_MULTIPLIER[18:20] = 1.8
+
 def simulate_dynamic_allocation():
     congestion_levels_dynamic = []
-    request_queue = deque()
 
     for hour in range(24):  # Simulate for 24 hours
         if hour % 4 == 0: #doing it every 4 hrs 
-
-            if 6 <= hour < 9:  
-                traffic_demand = np.vectorize(lambda x: x * 1.5 if x > 0 else x)(population_density) 
-            elif 9 <= hour < 12: 
-                traffic_demand = np.vectorize(lambda x: x * 1.2 if x > 0 else x)(population_density)  
-            elif 12 <= hour < 14:  
-                traffic_demand = np.vectorize(lambda x: x * 1.3 if x > 0 else x)(population_density) 
-            elif 14 <= hour < 18:  
-                traffic_demand = np.vectorize(lambda x: x * 1.1 if x > 0 else x)(population_density)  
-            elif 18 <= hour < 20:  
-                traffic_demand = np.vectorize(lambda x: x * 1.8 if x > 0 else x)(population_density) 
-            else:  
-                traffic_demand = np.vectorize(lambda x: x * 0.5 if x > 0 else x)(population_density)  
-            
             # Apply updated traffic demand to city database
-            for (x, y), data in city_database.items():
-                data["traffic_demand"] = traffic_demand[x, y]
-        
-        congested_count = 0
-        for (x, y), data in city_database.items():
-            if data["status"] == "congested": # yea okay idt my congestion logic is correct 
-                request_queue.append((x, y, "HS" if data["hs_count"] > 0 else "BS"))
-                congested_count += 1
+            city_database["traffic_demand"] = population_density * HOURLY_DEMAND_MULTIPLIER[hour]
         
+        # yea okay idt my congestion logic is correct 
+        congested = city_database["congested"]
+        congestion_levels_dynamic.append(int(np.count_nonzero(congested)))
+
         # Process Requests every hour (as we discussed)
-        process_requests(request_queue)
-        congestion_levels_dynamic.append(congested_count)
+        process_requests(congested)
 
     return congestion_levels_dynamic
 
 # Dynamic Allocation Processing
-def process_requests(request_queue):
-    while request_queue:
-        x, y, unit_type = request_queue.popleft()
-        data = city_database[(x, y)]
-        
-        if unit_type == "HS" and wifi_spectrum >= 50:
-            data["wifi_range"] += 50 #TODO: currently hardcoded to increase by 50 MHz - need to change
-        elif unit_type == "BS" and cellular_spectrum >= 50:
-            data["cellular_range"] += 50 #TODO: currently hardcoded to increase by 50 MHz - need to change
+def process_requests(congested):
+    """Every congested cell requests more spectrum: HS if it has any, BS otherwise."""
+    has_hs = city_database["hs_count"] > 0
+    if wifi_spectrum >= 50:
+        city_database["wifi_range"][congested & has_hs] += 50 #TODO: currently hardcoded to increase by 50 MHz - need to change
+    if cellular_spectrum >= 50:
+        city_database["cellular_range"][congested & ~has_hs] += 50 #TODO: currently hardcoded to increase by 50 MHz - need to change
 
 """
 STEP 7: Increase population density by 20% after 1 year
@@ -226,45 +222,7 @@ STEP 7: Increase population density by 20% after 1 year
 def increase_population_density():
     global population_density
     population_density = np.clip(population_density * 1.2, 0, 2)  #From GPT
-    for (x, y), data in city_database.items():
-        pop_density = population_density[x, y]
-        if pop_density == 2:
-            data["hs_count"] = 10
-            data["bs_count"] = 5
-        elif pop_density == 1:
-            data["hs_count"] = 5
-            data["bs_count"] = 2
-        else:
-            data["hs_count"] = 3
-            data["bs_count"] = 1
-
-
-#TODO: put in a loop!
-
-# Run the Simulation
-allocate_spectrum()
-distance_based_sharing()  
-detect_congestion()
-congestion_dynamic = simulate_dynamic_allocation()
-
-# After 1 Year, increase population density
-increase_population_density()
-allocate_spectrum() 
-distance_based_sharing()  
-detect_congestion() 
-
-
-# Plot Results
-plt.figure(figsize=(10, 5))
-plt.plot(range(24), congestion_dynamic, label="Dynamic Allocation", linestyle="-", marker="s")
-plt.xlabel("Time of Day (Hours)")
-plt.ylabel("Number of Congested Units")
-plt.title("Dynamic Spectrum Allocation Performance")
-plt.legend()
-plt.grid(True)
-plt.show()
-
-
+    city_database["hs_count"], city_database["bs_count"] = counts_for_density(population_density)
 
 
 def generate_report():
@@ -283,4 +241,31 @@ def generate_report():
         }
     # Congestion = x more units needed - $$ ?
     print("Final Report:", report)
-    return report
\ No newline at end of file
+    return report
+
+
+if __name__ == "__main__":
+    #TODO: put in a loop!
+
+    # Run the Simulation
+    allocate_spectrum()
+    distance_based_sharing()  
+    detect_congestion()
+    congestion_dynamic = simulate_dynamic_allocation()
+
+    # After 1 Year, increase population density
+    increase_population_density()
+    allocate_spectrum() 
+    distance_based_sharing()  
+    detect_congestion() 
+
+
+    # Plot Results
+    plt.figure(figsize=(10, 5))
+    plt.plot(range(24), congestion_dynamic, label="Dynamic Allocation", linestyle="-", marker="s")
+    plt.xlabel("Time of Day (Hours)")
+    plt.ylabel("Number of Congested Units")
+    plt.title("Dynamic Spectrum Allocation Performance")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,124 @@
+"""
+Spatially tiled interference graph.
+
+Interference never reaches further than max(D_w, D_c), so the city is cut into
+square tiles of TILE_SIZE cells. Every tile owns the units inside it and also
+sees a halo: the units of the neighboring tiles within the interference
+distance of its border. Each tile finds the interference edges from its owned
+units to the units of tile + halo in a process pool; an edge is kept only by
+the tile that owns its lower id, so the union over all tiles holds every edge
+exactly once and is the same adjacency matrix as networks.assign_group.
+
+Only the pair search is tiled. Groups are labelled by one
+networks.find_groups_and_sum_frequencies over the assembled matrix, which is
+cheaper than merging per-tile groups, and allocation runs in one pass over
+the resulting group ids.
+
+    adjacency = TiledCity(db.units, tile_size=50, halo=max(D_w, D_c)).assign_group(D_w, D_c)
+    group_freq = networks.find_groups_and_sum_frequencies(db.units, adjacency)
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import networks
+from networks import UnitType
+
+
+def tile_graph(task):
+    """
+    Worker for one tile. local_ids / local_positions / local_types hold the
+    tile's owned units first (num_owned of them), then its halo units.
+    Returns the tile's edges (rows, cols as global ids, rows < cols).
+    """
+    from scipy.spatial import cKDTree
+
+    num_owned, local_ids, local_positions, local_types, thresholds = task
+
+    rows, cols = [], []
+    for unit_type, threshold in thresholds:
+        local = np.flatnonzero(local_types == unit_type)
+        owned = local[local < num_owned]
+        if len(owned) == 0 or len(local) < 2:
+            continue
+        pairs = cKDTree(local_positions[owned]).sparse_distance_matrix(
+            cKDTree(local_positions[local]), threshold, output_type="ndarray")
+        a, b = owned[pairs["i"]], local[pairs["j"]]
+        keep = local_ids[a] < local_ids[b]
+        rows.append(a[keep])
+        cols.append(b[keep])
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return local_ids[np.concatenate(rows)], local_ids[np.concatenate(cols)]
+
+
+class TiledCity:
+    """
+    The units of a city split into tile_size x tile_size tiles with a halo of
+    halo cells. max_workers processes search the tiles' pairs (None = one per
+    CPU, 1 = no pool).
+    """
+    def __init__(self, units, tile_size, halo, max_workers=None):
+        assert tile_size > 0, f"[TiledCity]: tile_size must be positive, got {tile_size}."
+        self.units = units
+        self.tile_size = tile_size
+        self.halo = halo
+        self.max_workers = max_workers
+
+        positions = units.position
+        tile_xy = positions // tile_size
+        self.tiles_shape = tuple(int(n) + 1 for n in tile_xy.max(axis=0)) if len(units) else (0, 0)
+        self.unit_tile = tile_xy[:, 0].astype(np.int64) * self.tiles_shape[1] + tile_xy[:, 1]
+
+        self._order = np.argsort(self.unit_tile, kind="stable")
+        num_tiles = self.tiles_shape[0] * self.tiles_shape[1]
+        self._bounds = np.searchsorted(self.unit_tile[self._order], np.arange(num_tiles + 1))
+
+    def __len__(self):
+        return self.tiles_shape[0] * self.tiles_shape[1]
+
+    def owned(self, tile):
+        return self._order[self._bounds[tile]:self._bounds[tile + 1]]
+
+    def halo_units(self, tile):
+        """Units outside the tile but within halo cells of its border."""
+        tx, ty = divmod(tile, self.tiles_shape[1])
+        reach = math.ceil(self.halo / self.tile_size)
+        candidates = [
+            self.owned(nx * self.tiles_shape[1] + ny)
+            for nx in range(max(tx - reach, 0), min(tx + reach + 1, self.tiles_shape[0]))
+            for ny in range(max(ty - reach, 0), min(ty + reach + 1, self.tiles_shape[1]))
+            if (nx, ny) != (tx, ty)
+        ]
+        if not candidates:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(candidates)
+        low = np.array([tx, ty]) * self.tile_size - self.halo
+        high = (np.array([tx, ty]) + 1) * self.tile_size + self.halo
+        position = self.units.position[candidates]
+        inside = np.all((position >= low) & (position < high), axis=1)
+        return candidates[inside]
+
+    def _tasks(self, thresholds):
+        for tile in range(len(self)):
+            owned = self.owned(tile)
+            if len(owned) == 0:
+                continue
+            local = np.concatenate((owned, self.halo_units(tile)))
+            yield (len(owned), local, self.units.position[local], self.units.unit_type[local], thresholds)
+
+    def assign_group(self, D_w, D_c):
+        """Builds the interference graph tile by tile; same result as networks.assign_group."""
+        assert max(D_w, D_c) <= self.halo, f"[TiledCity][assign_group]: halo {self.halo} is narrower than the interference distance."
+        thresholds = ((UnitType.HS.value, D_w), (UnitType.BS.value, D_c))
+        if self.max_workers == 1:
+            results = [tile_graph(task) for task in self._tasks(thresholds)]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(tile_graph, self._tasks(thresholds), chunksize=16))
+
+        rows = np.concatenate([result[0] for result in results]) if results else np.empty(0, dtype=np.int64)
+        cols = np.concatenate([result[1] for result in results]) if results else np.empty(0, dtype=np.int64)
+        return networks.symmetric_adjacency(rows, cols, len(self.units))